@@ -0,0 +1,8 @@
+"""Балансировка аккумуляторов 18650: движок расчета, пакетная обработка и Telegram-бот
+
+Импорт пакета подключает только движок; Telegram-слой (battery_balancer.bot)
+загружается отдельно и не нужен процессам пула и CLI.
+"""
+from battery_balancer.engine import BatteryBalancer, WIRING_DIAGRAM_HEADER, explore_job, solve_job, text_length
+
+__all__ = ['BatteryBalancer', 'WIRING_DIAGRAM_HEADER', 'explore_job', 'solve_job', 'text_length']
@@ -0,0 +1,9 @@
+"""Telegram-бот балансировки аккумуляторов
+
+app - фабрика приложения и запуск, handlers - обработчики, runtime - общие
+объекты процесса, solver - пул расчетов с дедупликацией, pages - постраничная
+схема, settings - настройки из окружения. Telegram импортируется лениво.
+"""
+from battery_balancer.bot.app import build_application, main
+
+__all__ = ['build_application', 'main']
@@ -0,0 +1,145 @@
+"""Фабрика приложения и запуск бота
+
+Модули telegram и обработчики импортируются только внутри build_application,
+поэтому импорт этого модуля не тянет python-telegram-bot и не читает настройки.
+"""
+import asyncio
+import logging
+import os
+import signal
+from typing import TYPE_CHECKING, Optional
+
+if TYPE_CHECKING:
+    from telegram.ext import Application
+
+logger = logging.getLogger(__name__)
+
+LOG_FORMAT = '%(asctime)s - %(name)s - %(levelname)s - %(message)s'
+
+def setup_logging(log_file: Optional[str] = None) -> None:
+    """Настройка логирования: консоль и файл для логгеров пакета"""
+    logging.basicConfig(format=LOG_FORMAT, level=logging.INFO)
+    
+    if log_file:
+        file_handler = logging.FileHandler(log_file, encoding='utf-8')
+        file_handler.setLevel(logging.INFO)
+        file_handler.setFormatter(logging.Formatter(LOG_FORMAT))
+        logging.getLogger('battery_balancer').addHandler(file_handler)
+
+def build_application(token: str, base_url: Optional[str] = None, handle_signals: bool = True) -> 'Application':
+    """Создание приложения с зарегистрированными обработчиками
+    
+    base_url позволяет направить бота на другой сервер Bot API
+    (например, локальный сервер нагрузочного теста), формат: http://host:port/bot
+    
+    При запуске через run_polling возобновляются расчеты из снимка прошлой
+    остановки, а SIGINT/SIGTERM запускают корректную остановку. Без handle_signals
+    остановкой управляет внешний процесс (диспетчер шардов).
+    """
+    from telegram.ext import Application, CommandHandler, CallbackQueryHandler, MessageHandler, filters
+    
+    from battery_balancer.bot import handlers, settings
+    from battery_balancer.bot.runtime import sessions, shutdown_solver_pool
+    from battery_balancer.bot.sessions import run_sweeper
+    
+    background = set()
+    
+    async def on_startup(application: Application) -> None:
+        # Сигналы остановки обрабатываются сами, чтобы дождаться текущих расчетов
+        loop = asyncio.get_running_loop()
+        for signum in (signal.SIGINT, signal.SIGTERM) if handle_signals else ():
+            try:
+                loop.add_signal_handler(
+                    signum, lambda: application.create_task(handlers.graceful_shutdown(application))
+                )
+            except (NotImplementedError, RuntimeError):
+                logger.warning(f"Обработчик сигнала {signum} недоступен на этой платформе")
+        
+        # Результаты пользователя удаляются вместе с его сессией
+        sessions.on_evict = application.drop_user_data
+        background.add(asyncio.create_task(run_sweeper(sessions, settings.SESSION_SWEEP_SECONDS)))
+        await handlers.resume_jobs(application)
+    
+    async def on_shutdown(application: Application) -> None:
+        for task in background:
+            task.cancel()
+        shutdown_solver_pool()
+    
+    builder = (
+        Application.builder()
+        .token(token)
+        # Параллельная обработка: одинаковые расчеты разных пользователей
+        # пересекаются во времени и объединяются SingleFlightSolver
+        .concurrent_updates(settings.CONCURRENT_UPDATES)
+        .post_init(on_startup)
+        .post_shutdown(on_shutdown)
+    )
+    if base_url:
+        builder = builder.base_url(base_url)
+    application = builder.build()
+    
+    # Регистрация обработчиков
+    application.add_handler(CommandHandler("start", handlers.start))
+    application.add_handler(CommandHandler("reset", handlers.reset_command))
+    application.add_handler(CommandHandler("help", handlers.help_command))
+    application.add_handler(CommandHandler("status", handlers.status_command))
+    application.add_handler(CommandHandler("cancel", handlers.cancel_command))
+    application.add_handler(CommandHandler("explore", handlers.explore_command))
+    application.add_handler(CommandHandler("profile", handlers.profile_command))
+    
+    # Обработчики callback запросов (кнопок)
+    application.add_handler(CallbackQueryHandler(handlers.button_handler))
+    
+    # Обработчики текстовых сообщений
+    application.add_handler(MessageHandler(filters.TEXT & ~filters.COMMAND, handlers.message_handler))
+    
+    return application
+
+def main() -> None:
+    """Запуск бота"""
+    from dotenv import load_dotenv
+    load_dotenv()
+    
+    from battery_balancer.bot import settings
+    setup_logging(settings.LOG_FILE)
+    
+    try:
+        # Загружаем токен из переменных окружения
+        token = os.getenv('TELEGRAM_BOT_TOKEN')
+        
+        if not token:
+            logger.error("Не задан TELEGRAM_BOT_TOKEN в переменных окружения")
+            print("❌ ОШИБКА: Не задан токен бота!")
+            print("📝 Создайте файл .env с переменной TELEGRAM_BOT_TOKEN")
+            print("💡 Или экспортируйте переменную: export TELEGRAM_BOT_TOKEN='ваш_токен'")
+            return
+        
+        # Многопроцессный режим: диспетчер и процессы-шарды по user_id
+        if settings.BOT_SHARDS > 1:
+            from battery_balancer.bot.sharding import run_supervisor
+            logger.info(f"Бот запущен в режиме шардов: {settings.BOT_SHARDS}")
+            print(f"✅ Бот успешно запущен! Процессов-шардов: {settings.BOT_SHARDS}")
+            run_supervisor(token, os.getenv('TELEGRAM_API_BASE_URL'), settings.BOT_SHARDS)
+            return
+        
+        from telegram import Update
+        
+        from battery_balancer.bot.runtime import start_solver_pool
+        from battery_balancer.bot.sharding import reshard_snapshots
+        # Снимки, оставшиеся от многопроцессного режима, сводятся в общий
+        reshard_snapshots(1)
+        start_solver_pool()
+        
+        application = build_application(token, os.getenv('TELEGRAM_API_BASE_URL'))
+        
+        # Запуск бота
+        logger.info("Бот запущен...")
+        print("✅ Бот успешно запущен!")
+        print("📱 Используйте команду /start в Telegram для начала работы")
+        
+        # Сигналы остановки обрабатывает graceful_shutdown (см. build_application)
+        application.run_polling(allowed_updates=Update.ALL_TYPES, stop_signals=None)
+        
+    except Exception as e:
+        logger.error(f"Ошибка при запуске бота: {e}")
+        print(f"❌ Критическая ошибка: {e}")
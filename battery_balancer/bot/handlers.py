@@ -0,0 +1,972 @@
+"""Обработчики команд, кнопок и сообщений Telegram"""
+import asyncio
+import logging
+import time
+from datetime import datetime
+
+from telegram import Chat, Message, Update, InlineKeyboardButton, InlineKeyboardMarkup
+from telegram.ext import ContextTypes
+
+from battery_balancer.bot import settings
+from battery_balancer.bot.pages import DiagramPager, result_summary
+from battery_balancer.bot.runtime import balancer, explore_layouts, jobs, profiler, sessions, solver
+from battery_balancer.engine.export import get_writer
+
+logger = logging.getLogger(__name__)
+
+EXPORT_CAPTIONS = {
+    'csv': "📁 Файл с результатами балансировки",
+    'json': "📁 Результаты балансировки в JSON",
+    'jig': "🛠 Раскладка для сборочного стапеля"
+}
+
+def get_help_text() -> str:
+    """Получить текст помощи"""
+    return """ℹ️ ПОМОЩЬ ПО ИСПОЛЬЗОВАНИЮ БОТА
+
+🔋 Этот бот помогает создать сбалансированную сборку аккумуляторов 18650.
+
+📋 КАК ПОЛЬЗОВАТЬСЯ:
+1. ⚙️ Настройте конфигурацию (S и P)
+2. 📝 Введите емкости всех аккумуляторов
+3. 📊 Рассчитайте оптимальное распределение
+4. 💾 Скачайте результаты в CSV
+
+🔧 КОМАНДЫ:
+/start - начать работу
+/reset - сбросить все данные
+/status - показать текущее состояние
+/explore - подобрать лучшую конфигурацию S×P
+/cancel - отменить текущую операцию
+/help - показать эту справку
+
+📖 ОБОЗНАЧЕНИЯ:
+• 🔢 S - количество последовательных групп
+• 🔢 P - количество параллельных аккумуляторов в группе
+• 🔋 мАч - емкость аккумулятора
+• 🔌 мОм - внутреннее сопротивление (необязательно, формат 2500/45)
+• ⚖️ Отклонение - разница от средней емкости группы
+
+💡 ПРИМЕР:
+Для сборки 4S2P нужно 8 аккумуляторов.
+Введите их емкости, например: 2500 2550 2600 2450 2520 2480 2580 2420
+
+⚠️ ОГРАНИЧЕНИЯ:
+• Максимум 200 аккумуляторов в сборке
+• Емкости: 500-10000 мАч
+• Напряжение: 2.5-4.5 В"""
+
+async def start(update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
+    """Обработчик команды /start"""
+    user_id = update.effective_user.id
+    
+    # Инициализируем данные пользователя
+    sessions[user_id] = {
+        'step': 'config',
+        'series': None,
+        'parallel': None,
+        'voltage': 3.7,
+        'capacities': []
+    }
+    
+    keyboard = [
+        [InlineKeyboardButton("⚙️ Настроить конфигурацию", callback_data="config")],
+        [InlineKeyboardButton("📊 Рассчитать сборку", callback_data="calculate")],
+        [InlineKeyboardButton("ℹ️ Помощь", callback_data="help")]
+    ]
+    reply_markup = InlineKeyboardMarkup(keyboard)
+    
+    await update.message.reply_text(
+        "🔋 Добро пожаловать в бот для балансировки аккумуляторов 18650!\n\n"
+        "Я помогу вам оптимально распределить аккумуляторы по параллельным группам "
+        "для создания сбалансированной сборки.\n\n"
+        "Выберите действие:",
+        reply_markup=reply_markup
+    )
+
+async def reset_command(update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
+    """Обработчик команды /reset - сброс данных пользователя"""
+    user_id = update.effective_user.id
+    
+    if user_id in sessions:
+        del sessions[user_id]
+    
+    # Инициализируем заново
+    sessions[user_id] = {
+        'step': 'config',
+        'series': None,
+        'parallel': None,
+        'voltage': 3.7,
+        'capacities': []
+    }
+    
+    await update.message.reply_text(
+        "✅ Все данные сброшены! Начинаем заново.\n\n"
+        "Используйте /start для начала работы или настройте конфигурацию:",
+        reply_markup=InlineKeyboardMarkup([
+            [InlineKeyboardButton("⚙️ Настроить конфигурацию", callback_data="config")]
+        ])
+    )
+
+async def show_progress(message, progress: int, total: int = 100):
+    """Показать прогресс-бар"""
+    bars = "█" * (progress // 10)
+    spaces = " " * (10 - (progress // 10))
+    
+    try:
+        await message.edit_text(
+            f"🔄 Выполняется расчет оптимальной балансировки...\n\n"
+            f"📊 Прогресс: [{bars}{spaces}] {progress}%\n"
+            f"⏳ Пожалуйста, подождите..."
+        )
+    except Exception as e:
+        logger.debug(f"Progress update failed: {e}")
+
+async def button_handler(update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
+    """Обработчик нажатий кнопок"""
+    query = update.callback_query
+    # Листание страниц отвечает на запрос само: устаревший результат - всплывающим окном
+    if not query.data.startswith("page:"):
+        await query.answer()
+    
+    user_id = query.from_user.id
+    
+    # Обработка неожиданных состояний - инициализация данных пользователя если их нет
+    if user_id not in sessions:
+        sessions[user_id] = {
+            'step': 'config',
+            'series': None,
+            'parallel': None,
+            'voltage': 3.7,
+            'capacities': []
+        }
+    
+    data = query.data
+    
+    if data == "config":
+        await config_handler(query, context)
+    elif data == "calculate":
+        await calculate_handler(query, context)
+    elif data == "help":
+        await help_handler(query, context)
+    elif data == "back":
+        await start_callback(query, context)
+    elif data == "set_series":
+        await set_series_handler(query, context)
+    elif data == "set_parallel":
+        await set_parallel_handler(query, context)
+    elif data == "set_voltage":
+        await set_voltage_handler(query, context)
+    elif data == "set_capacities":
+        await set_capacities_handler(query, context)
+    elif data == "download_csv":
+        await download_report_handler(query, context, 'csv')
+    elif data.startswith("download:"):
+        await download_report_handler(query, context, data.split(':', 1)[1])
+    elif data.startswith("page:"):
+        await diagram_page_handler(query, context)
+
+async def config_handler(query, context):
+    """Настройка конфигурации"""
+    user_id = query.from_user.id
+    
+    # Обработка неожиданных состояний
+    if user_id not in sessions:
+        await start_callback(query, context)
+        return
+        
+    user_data = sessions.get(user_id, {})
+    
+    keyboard = [
+        [InlineKeyboardButton("🔢 Количество последовательно (S)", callback_data="set_series")],
+        [InlineKeyboardButton("🔢 Количество параллельно (P)", callback_data="set_parallel")],
+        [InlineKeyboardButton("⚡ Напряжение аккумулятора", callback_data="set_voltage")],
+        [InlineKeyboardButton("📝 Ввести емкости", callback_data="set_capacities")],
+        [InlineKeyboardButton("🔙 Назад", callback_data="back")]
+    ]
+    reply_markup = InlineKeyboardMarkup(keyboard)
+    
+    config_text = f"""⚙️ Текущая конфигурация:
+
+🔢 Последовательно (S): {user_data.get('series', 'не задано')}
+🔢 Параллельно (P): {user_data.get('parallel', 'не задано')}
+⚡ Напряжение: {user_data.get('voltage', 3.7)} В
+📊 Аккумуляторов: {len(user_data.get('capacities', []))} шт
+
+Выберите параметр для настройки:"""
+    
+    await query.edit_message_text(config_text, reply_markup=reply_markup)
+
+async def set_series_handler(query, context):
+    """Установка количества последовательных групп"""
+    user_id = query.from_user.id
+    
+    # Обработка неожиданных состояний
+    if user_id not in sessions:
+        await start_callback(query, context)
+        return
+        
+    user_data = sessions.get(user_id, {})
+    user_data['step'] = 'waiting_series'
+    
+    await query.edit_message_text(
+        "🔢 Введите количество последовательных групп (S) от 1 до 50:\n\n"
+        "Пример: 4\n\n"
+        "💡 Для отмены используйте /reset"
+    )
+
+async def set_parallel_handler(query, context):
+    """Установка количества параллельных аккумуляторов"""
+    user_id = query.from_user.id
+    
+    # Обработка неожиданных состояний
+    if user_id not in sessions:
+        await start_callback(query, context)
+        return
+        
+    user_data = sessions.get(user_id, {})
+    user_data['step'] = 'waiting_parallel'
+    
+    await query.edit_message_text(
+        "🔢 Введите количество параллельных аккумуляторов (P) от 1 до 50:\n\n"
+        "Пример: 2\n\n"
+        "💡 Для отмены используйте /reset"
+    )
+
+async def set_voltage_handler(query, context):
+    """Установка напряжения аккумулятора"""
+    user_id = query.from_user.id
+    
+    # Обработка неожиданных состояний
+    if user_id not in sessions:
+        await start_callback(query, context)
+        return
+        
+    user_data = sessions.get(user_id, {})
+    user_data['step'] = 'waiting_voltage'
+    
+    await query.edit_message_text(
+        "⚡ Введите напряжение одного аккумулятора (2.5-4.5 В):\n\n"
+        "Пример: 3.7\n\n"
+        "💡 Обычно используется 3.6-3.7 В\n"
+        "💡 Для отмены используйте /reset"
+    )
+
+async def set_capacities_handler(query, context):
+    """Ввод емкостей аккумуляторов"""
+    user_id = query.from_user.id
+    
+    # Обработка неожиданных состояний
+    if user_id not in sessions:
+        await start_callback(query, context)
+        return
+        
+    user_data = sessions.get(user_id, {})
+    
+    series = user_data.get('series')
+    parallel = user_data.get('parallel')
+    
+    if not series or not parallel:
+        await query.edit_message_text(
+            "❌ Сначала настройте конфигурацию (S и P)",
+            reply_markup=InlineKeyboardMarkup([[InlineKeyboardButton("⚙️ Настроить", callback_data="config")]])
+        )
+        return
+    
+    required_cells = series * parallel
+    user_data['step'] = 'waiting_capacities'
+    
+    await query.edit_message_text(
+        f"📝 Введите емкости {required_cells} аккумуляторов через пробел:\n\n"
+        f"Пример для {required_cells} аккумуляторов:\n"
+        f"2500 2550 2600 2450 2520 2480 2580 2420\n\n"
+        f"Диапазон: 500-10000 мАч\n"
+        f"Разделитель: пробел\n\n"
+        f"🔌 Можно указать внутреннее сопротивление (мОм) через /:\n"
+        f"2500/45 2550/38 2600/41 ...\n\n"
+        f"💡 Для отмены используйте /reset"
+    )
+
+async def calculate_handler(query, context):
+    """Расчет сборки с прогресс-баром"""
+    user_id = query.from_user.id
+    
+    # Проверяем наличие данных пользователя
+    if user_id not in sessions:
+        await query.edit_message_text(
+            "❌ Данные не найдены. Начните с команды /start",
+            reply_markup=InlineKeyboardMarkup([[InlineKeyboardButton("🔄 Начать заново", callback_data="back")]])
+        )
+        return
+    
+    user_data = sessions[user_id]
+    
+    # Проверяем наличие всех необходимых данных
+    if user_data is None or not user_data.get('series') or not user_data.get('parallel'):
+        await query.edit_message_text(
+            "❌ Сначала настройте конфигурацию (S и P)",
+            reply_markup=InlineKeyboardMarkup([[InlineKeyboardButton("⚙️ Настроить", callback_data="config")]])
+        )
+        return
+    
+    capacities = user_data.get('capacities', [])
+    required_cells = user_data['series'] * user_data['parallel']
+    
+    if len(capacities) != required_cells:
+        await query.edit_message_text(
+            f"❌ Необходимо ввести емкости для {required_cells} аккумуляторов\n"
+            f"Сейчас введено: {len(capacities)}",
+            reply_markup=InlineKeyboardMarkup([[InlineKeyboardButton("📝 Ввести емкости", callback_data="set_capacities")]])
+        )
+        return
+    
+    # Во время остановки новые расчеты не принимаются
+    if not jobs.accepting:
+        await query.edit_message_text(
+            "🔄 Бот перезапускается. Повторите расчет через минуту",
+            reply_markup=InlineKeyboardMarkup([[InlineKeyboardButton("📊 Рассчитать", callback_data="calculate")]])
+        )
+        return
+    
+    # Обновления обрабатываются параллельно: повторное нажатие "Рассчитать"
+    # во время расчета (в том числе возобновленного) запустило бы второй расчет,
+    # правящий то же сообщение, поэтому оно игнорируется
+    if not jobs.reserve(user_id):
+        logger.info(f"Calculation for user {user_id} is already running, ignoring repeated request")
+        return
+    
+    try:
+        # Начинаем расчет с прогресс-баром
+        progress_msg = await query.edit_message_text("🔄 Выполняется расчет оптимальной балансировки...\n\n📊 Прогресс: [          ] 0%")
+        
+        # Описание расчета достаточно для его повтора после перезапуска бота
+        descriptor = {
+            'user_id': user_id,
+            'chat_id': progress_msg.chat_id,
+            'message_id': progress_msg.message_id,
+            'series': user_data['series'],
+            'parallel': user_data['parallel'],
+            'voltage': user_data.get('voltage', 3.7),
+            'capacities': list(capacities),
+            'resistances': list(user_data['resistances']) if user_data.get('resistances') is not None else None,
+            'created': time.time()
+        }
+        
+        # Расчет идет отдельной задачей: при остановке отменяется только он,
+        # а не обработка обновлений
+        task = jobs.start(run_calculation(progress_msg, descriptor, context.user_data), descriptor)
+        await asyncio.wait({task})
+    finally:
+        jobs.release(user_id)
+
+async def run_calculation(progress_msg, descriptor: dict, result_store: dict) -> None:
+    """Расчет сборки по описанию с выводом прогресса и результата в progress_msg"""
+    user_id = descriptor['user_id']
+    capacities = descriptor['capacities']
+    
+    try:
+        series = descriptor['series']
+        parallel = descriptor['parallel']
+        voltage = descriptor['voltage']
+        
+        # Обновляем прогресс
+        await show_progress(progress_msg, 10)
+        await asyncio.sleep(0.5)
+        
+        # Валидация данных перед расчетом
+        is_valid, error_msg = balancer.validate_configuration(series, parallel)
+        if not is_valid:
+            await progress_msg.edit_text(f"❌ Ошибка конфигурации: {error_msg}")
+            return
+            
+        is_valid, error_msg = balancer.validate_capacities(capacities)
+        if not is_valid:
+            await progress_msg.edit_text(f"❌ Ошибка в данных емкостей: {error_msg}")
+            return
+            
+        is_valid, error_msg = balancer.validate_voltage(voltage)
+        if not is_valid:
+            await progress_msg.edit_text(f"❌ Ошибка в напряжении: {error_msg}")
+            return
+        
+        # Обновляем прогресс
+        await show_progress(progress_msg, 30)
+        await asyncio.sleep(0.5)
+        
+        # Балансируем аккумуляторы
+        await show_progress(progress_msg, 50)
+        resistances = descriptor['resistances']
+        job = {
+            'user_id': user_id,
+            'series': series,
+            'parallel': parallel,
+            'voltage': voltage,
+            'cells': len(capacities),
+            'with_ir': resistances is not None
+        }
+        solve_started = time.perf_counter()
+        profiled = None
+        if profiler.should_sample():
+            try:
+                # Шаги движка в процессе пула под cProfile, без дедупликации;
+                # сводку и страницы результата строит бот, как для обычного расчета
+                profiled = await profiler.run_profiled(
+                    solver.executor, job, capacities, resistances, solver.bucket_width, solver.ir_weight,
+                    settings.ROBUSTNESS_NOISE, settings.ROBUSTNESS_SAMPLES,
+                    settings.TELEGRAM_MESSAGE_LIMIT - DiagramPager.PAGE_MARGIN
+                )
+            except Exception as e:
+                logger.warning(f"Profiled calculation failed, falling back to solver: {e}")
+        if profiled is not None:
+            groups, stats = profiled
+        else:
+            groups = await solver.solve(capacities, series, parallel, resistances)
+            logger.info(
+                f"Single-flight: запросов {solver.metrics['requests']}, "
+                f"расчетов {solver.metrics['computed']}, сэкономлено {solver.saved}"
+            )
+            job['solve_seconds'] = time.perf_counter() - solve_started
+        
+        # Обновляем прогресс
+        await show_progress(progress_msg, 80)
+        await asyncio.sleep(0.5)
+        
+        if profiled is None:
+            # Рассчитываем статистику
+            report_started = time.perf_counter()
+            stats = balancer.calculate_statistics(groups, series, voltage)
+            
+            # Оцениваем устойчивость раскладки к погрешности измерений
+            if settings.ROBUSTNESS_SAMPLES > 0:
+                try:
+                    # NumPy отпускает GIL, поэтому пакетный расчет уходит в поток
+                    stats['robustness'] = await asyncio.get_running_loop().run_in_executor(
+                        None, balancer.analyze_robustness, groups, settings.ROBUSTNESS_NOISE,
+                        settings.ROBUSTNESS_SAMPLES
+                    )
+                except Exception as e:
+                    logger.warning(f"Robustness analysis failed: {e}")
+            
+            job['report_seconds'] = time.perf_counter() - report_started
+            profiler.record(job['solve_seconds'] + job['report_seconds'], job)
+        
+        # Завершаем прогресс
+        await show_progress(progress_msg, 100)
+        await asyncio.sleep(0.5)
+        
+        # Формируем сообщение с результатами
+        result_text = result_summary(series, parallel, stats)
+
+        # Схема распайки разбивается на страницы под лимит сообщения Telegram
+        result_id = result_store.get('last_result_id', 0) + 1
+        pager = DiagramPager(result_id, result_text, groups, stats)
+        
+        # Сохраняем результаты для скачивания и перелистывания;
+        # файлы отчетов формируются при скачивании в выбранном формате
+        result_store['last_report'] = {
+            'groups': groups,
+            'stats': stats,
+            'series': series,
+            'parallel': parallel,
+            'voltage': voltage
+        }
+        result_store['last_result_id'] = result_id
+        result_store['last_pages'] = pager
+        
+        await progress_msg.edit_text(pager.page_text(0), reply_markup=pager.reply_markup(0))
+        
+    except Exception as e:
+        logger.error(f"Calculation error: {e}")
+        error_text = f"❌ Произошла ошибка при расчете: {str(e)}\n\nПожалуйста, проверьте введенные данные и попробуйте снова."
+        # Расчет идет фоновой задачей, ее исключение никто не заберет
+        try:
+            await progress_msg.edit_text(
+                error_text,
+                reply_markup=InlineKeyboardMarkup([[InlineKeyboardButton("🔙 Назад", callback_data="config")]])
+            )
+        except Exception as edit_error:
+            logger.error(f"Failed to report calculation error to user {user_id}: {edit_error}")
+
+async def resume_jobs(application) -> None:
+    """Возобновление расчетов, прерванных прошлой остановкой бота
+    
+    Результат выводится в исходное сообщение с прогресс-баром.
+    """
+    descriptors = jobs.load_snapshot(settings.RESUME_MAX_AGE_SECONDS)
+    for descriptor in descriptors:
+        # Сессия восстанавливается из описания: результат живет, пока жива сессия
+        if descriptor['user_id'] not in sessions:
+            sessions[descriptor['user_id']] = {
+                'step': 'config',
+                'series': descriptor['series'],
+                'parallel': descriptor['parallel'],
+                'voltage': descriptor['voltage'],
+                'capacities': descriptor['capacities'],
+                'resistances': descriptor['resistances']
+            }
+        progress_msg = Message(descriptor['message_id'], datetime.now(), Chat(descriptor['chat_id'], Chat.PRIVATE))
+        progress_msg.set_bot(application.bot)
+        result_store = application.user_data[descriptor['user_id']]
+        jobs.start(run_calculation(progress_msg, descriptor, result_store), descriptor)
+    
+    if descriptors:
+        logger.info(f"Возобновлено расчетов после перезапуска: {len(descriptors)}")
+
+async def graceful_shutdown(application) -> None:
+    """Корректная остановка бота
+    
+    Новые расчеты не принимаются, текущим дается SHUTDOWN_GRACE_SECONDS
+    на завершение, оставшиеся сохраняются в снимок для возобновления.
+    Повторный сигнал останавливает бота сразу.
+    """
+    if not jobs.accepting:
+        logger.warning("Повторный сигнал остановки, расчеты не ожидаются")
+        application.stop_running()
+        return
+    
+    jobs.accepting = False
+    logger.info(f"Остановка: ожидание расчетов ({jobs.running}) до {settings.SHUTDOWN_GRACE_SECONDS:.0f} с")
+    unfinished = await jobs.drain(settings.SHUTDOWN_GRACE_SECONDS)
+    
+    if unfinished:
+        try:
+            jobs.save_snapshot(unfinished)
+        except OSError as e:
+            logger.error(f"Не удалось сохранить незавершенные расчеты: {e}")
+        for descriptor in unfinished:
+            try:
+                await application.bot.edit_message_text(
+                    "🔄 Бот перезапускается. Расчет продолжится автоматически после запуска",
+                    chat_id=descriptor['chat_id'],
+                    message_id=descriptor['message_id']
+                )
+            except Exception as e:
+                logger.warning(f"Failed to notify user {descriptor['user_id']} about restart: {e}")
+    
+    application.stop_running()
+
+async def cancel_command(update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
+    """Отмена текущей операции"""
+    user_id = update.effective_user.id
+    
+    if user_id in sessions:
+        sessions[user_id]['step'] = 'config'
+    
+    await update.message.reply_text(
+        "✅ Текущая операция отменена. Вы возвращены в главное меню.",
+        reply_markup=InlineKeyboardMarkup([[InlineKeyboardButton("🏠 Главное меню", callback_data="back")]])
+    )
+
+async def explore_command(update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
+    """Обработчик команды /explore - подбор лучшей конфигурации S x P
+    
+    Формат: /explore [Umin-Umax] [емкости]. Без емкостей используются
+    введенные ранее, без диапазона напряжений перебираются все конфигурации.
+    """
+    user_id = update.effective_user.id
+    user_data = sessions.get(user_id, {})
+    voltage = user_data.get('voltage', 3.7)
+    args = list(context.args or [])
+    
+    min_voltage = max_voltage = None
+    if args and '-' in args[0]:
+        try:
+            min_voltage, max_voltage = (float(part.replace(',', '.')) for part in args.pop(0).split('-', 1))
+        except ValueError:
+            await update.message.reply_text("❌ Диапазон напряжений задается так: 36-42")
+            return
+    
+    # Емкости из аргументов не подменяются сохраненными: подбор шел бы не для того набора
+    try:
+        capacities, _ = balancer.parse_cell_records(' '.join(args))
+        if args and not capacities:
+            raise ValueError("В аргументах нет емкостей")
+    except ValueError as e:
+        await update.message.reply_text(
+            f"❌ Не удалось разобрать емкости: {e}\n\n"
+            "Пример: /explore 36-42 2500 2550 2600 2450 2520 2480 2580 2420"
+        )
+        return
+    capacities = capacities or user_data.get('capacities', [])
+    
+    if not capacities:
+        await update.message.reply_text(
+            "❌ Нет емкостей для подбора\n\n"
+            "Пример: /explore 36-42 2500 2550 2600 2450 2520 2480 2580 2420\n"
+            "или сначала введите емкости через меню конфигурации"
+        )
+        return
+    
+    is_valid, error_msg = balancer.validate_capacities(capacities)
+    if not is_valid:
+        await update.message.reply_text(f"❌ Ошибка в данных емкостей: {error_msg}")
+        return
+    
+    progress_msg = await update.message.reply_text(
+        f"🔍 Подбираю конфигурации для {len(capacities)} аккумуляторов..."
+    )
+    
+    try:
+        results, summary = await explore_layouts(capacities, voltage, min_voltage, max_voltage)
+    except Exception as e:
+        logger.error(f"Explore error: {e}")
+        await progress_msg.edit_text(f"❌ Произошла ошибка при подборе: {str(e)}")
+        return
+    
+    if not results:
+        await progress_msg.edit_text("❌ Нет конфигураций, подходящих под заданный диапазон напряжений")
+        return
+    
+    lines = [
+        f"🔍 ПОДБОР КОНФИГУРАЦИИ ({len(capacities)} шт, {voltage} В)",
+        "",
+        f"📊 Рассмотрено: {summary['layouts']}, рассчитано: {summary['solved']}, отсечено: {summary['pruned']}",
+        ""
+    ]
+    for place, result in enumerate(results, 1):
+        leftover = f", остаток {result['leftover']} шт" if result['leftover'] else ""
+        lines.append(
+            f"{place}. {result['series']}S{result['parallel']}P - "
+            f"{result['pack_voltage']:.1f} В, {result['total_capacity']:.0f} мАч, "
+            f"{result['total_energy']:.1f} Вт·ч, ✅ {result['balance_quality']:.1f}%{leftover}"
+        )
+    
+    await progress_msg.edit_text('\n'.join(lines))
+
+async def profile_command(update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
+    """Обработчик команды /profile (только для администраторов)
+    
+    /profile - состояние и самые медленные расчеты
+    /profile rate 0.1 - доля профилируемых расчетов (0 - выключить)
+    /profile mem on|off - трассировка памяти tracemalloc
+    """
+    user_id = update.effective_user.id
+    if user_id not in settings.ADMIN_IDS:
+        await update.message.reply_text("❌ Команда доступна только администраторам")
+        return
+    
+    args = [arg.lower() for arg in (context.args or [])]
+    try:
+        if args[:1] == ['rate'] and len(args) == 2:
+            rate = float(args[1].replace(',', '.'))
+            if not (0 <= rate <= 1):
+                raise ValueError
+            profiler.sample_rate = rate
+        elif args[:1] == ['mem'] and len(args) == 2 and args[1] in ('on', 'off'):
+            profiler.trace_memory = args[1] == 'on'
+        elif args:
+            raise ValueError
+    except ValueError:
+        await update.message.reply_text(
+            "❌ Использование:\n"
+            "/profile - состояние\n"
+            "/profile rate 0.1 - доля профилируемых расчетов (0-1)\n"
+            "/profile mem on|off - трассировка памяти"
+        )
+        return
+    
+    lines = [
+        "🩺 ПРОФИЛИРОВАНИЕ",
+        "",
+        f"📊 Доля профилируемых расчетов: {profiler.sample_rate:g}",
+        f"🧠 Трассировка памяти: {'вкл' if profiler.trace_memory else 'выкл'}",
+        f"📁 Каталог профилей: {profiler.output_dir}",
+        f"🔢 Сохранено профилей: {profiler.profiled_jobs}",
+        "",
+        f"👥 Активных сессий: {len(sessions)} (~{sessions.memory_usage() / 1024:.1f} КБ)",
+        f"🗂 Сохраненных результатов: {len(context.application.user_data)}",
+        f"🧹 Вытеснено сессий: {sessions.evicted} (простой > {sessions.idle_seconds / 3600:g} ч, "
+        f"лимит {sessions.max_sessions})",
+        "",
+        f"🐢 САМЫЕ МЕДЛЕННЫЕ РАСЧЕТЫ (топ {profiler.top_n}, без профилированных):"
+    ]
+    slowest = profiler.slowest()
+    if not slowest:
+        lines.append("нет данных")
+    for place, job in enumerate(slowest, 1):
+        lines.append(
+            f"{place}. {job['duration']:.3f} с - {job['series']}S{job['parallel']}P, "
+            f"{job['cells']} шт{', IR' if job['with_ir'] else ''}, user {job['user_id']} "
+            f"(расчет {job['solve_seconds']:.3f} с, отчет {job['report_seconds']:.3f} с)"
+        )
+    
+    await update.message.reply_text('\n'.join(lines))
+
+async def status_command(update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
+    """Показать текущее состояние"""
+    user_id = update.effective_user.id
+    
+    if user_id not in sessions:
+        await update.message.reply_text("❌ Нет активной сессии. Используйте /start")
+        return
+    
+    user_data = sessions[user_id]
+    
+    status_text = f"""📋 ТЕКУЩЕЕ СОСТОЯНИЕ:
+
+🔢 Последовательно (S): {user_data.get('series', 'не задано')}
+🔢 Параллельно (P): {user_data.get('parallel', 'не задано')}
+⚡ Напряжение: {user_data.get('voltage', 3.7)} В
+📊 Введено аккумуляторов: {len(user_data.get('capacities', []))} шт
+📈 Требуется аккумуляторов: {user_data.get('series', 0) * user_data.get('parallel', 0) if user_data.get('series') and user_data.get('parallel') else 'не задано'} шт"""
+
+    await update.message.reply_text(status_text)
+
+async def help_handler(query, context):
+    """Помощь"""
+    keyboard = [[InlineKeyboardButton("🔙 Назад", callback_data="back")]]
+    reply_markup = InlineKeyboardMarkup(keyboard)
+    await query.edit_message_text(get_help_text(), reply_markup=reply_markup)
+
+async def help_command(update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
+    """Обработчик команды /help"""
+    keyboard = [[InlineKeyboardButton("🔙 Назад", callback_data="back")]]
+    reply_markup = InlineKeyboardMarkup(keyboard)
+    await update.message.reply_text(get_help_text(), reply_markup=reply_markup)
+
+async def download_report_handler(query, context, format_name: str = 'csv'):
+    """Скачивание результата в формате format_name (csv, json, jig)"""
+    report = context.user_data.get('last_report')
+    
+    if report:
+        try:
+            writer = get_writer(format_name)
+            await query.message.reply_document(
+                document=balancer.export_report(format_name, **report),
+                filename=f"battery_config_{report['series']}S{report['parallel']}P.{writer.extension}",
+                caption=EXPORT_CAPTIONS.get(format_name, EXPORT_CAPTIONS['csv'])
+            )
+            await query.answer("✅ Файл отправлен")
+        except Exception as e:
+            logger.error(f"File send error ({format_name}): {e}")
+            await query.answer("❌ Ошибка отправки файла", show_alert=True)
+    else:
+        await query.answer("❌ Файл не найден", show_alert=True)
+
+async def diagram_page_handler(query, context):
+    """Перелистывание страниц схемы распайки"""
+    try:
+        _, result_id, index = query.data.split(':')
+        result_id, index = int(result_id), int(index)
+    except ValueError:
+        logger.debug(f"Bad page callback: {query.data}")
+        await query.answer()
+        return
+    
+    pager = context.user_data.get('last_pages')
+    if pager is None or pager.result_id != result_id or not pager.has_page(index):
+        # Сообщение не трогаем: на нем остается уже показанная страница схемы
+        await query.answer("❌ Результат устарел. Выполните расчет заново.", show_alert=True)
+        return
+    
+    await query.answer()
+    await query.edit_message_text(pager.page_text(index), reply_markup=pager.reply_markup(index))
+
+async def start_callback(query, context):
+    """Возврат в главное меню"""
+    user_id = query.from_user.id
+    
+    # Сбрасываем данные пользователя
+    sessions[user_id] = {
+        'step': 'config',
+        'series': None,
+        'parallel': None,
+        'voltage': 3.7,
+        'capacities': []
+    }
+    
+    keyboard = [
+        [InlineKeyboardButton("⚙️ Настроить конфигурацию", callback_data="config")],
+        [InlineKeyboardButton("📊 Рассчитать сборку", callback_data="calculate")],
+        [InlineKeyboardButton("ℹ️ Помощь", callback_data="help")]
+    ]
+    reply_markup = InlineKeyboardMarkup(keyboard)
+    
+    await query.edit_message_text(
+        "🔋 Добро пожаловать в бот для балансировки аккумуляторов 18650!\n\n"
+        "Выберите действие:",
+        reply_markup=reply_markup
+    )
+
+async def message_handler(update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
+    """Обработчик текстовых сообщений с улучшенной валидацией"""
+    user_id = update.effective_user.id
+    text = update.message.text.strip().lower()
+    
+    # Обработка команд
+    if text == '/cancel':
+        await cancel_command(update, context)
+        return
+    
+    if text == '/reset':
+        await reset_command(update, context)
+        return
+    
+    if text == '/status':
+        await status_command(update, context)
+        return
+    
+    if text == '/help':
+        await help_command(update, context)
+        return
+    
+    # Обработка неожиданных состояний - инициализация если данных нет
+    if user_id not in sessions:
+        sessions[user_id] = {
+            'step': 'config',
+            'series': None,
+            'parallel': None,
+            'voltage': 3.7,
+            'capacities': []
+        }
+    
+    user_data = sessions[user_id]
+    
+    if user_data.get('step') == 'waiting_series':
+        try:
+            series = int(text)
+            is_valid, error_msg = balancer.validate_configuration(series, 1)  # Проверяем только series
+            if is_valid:
+                user_data['series'] = series
+                user_data['step'] = 'config'
+                await update.message.reply_text(f"✅ Установлено последовательно: {series}S")
+                await show_config_menu(update, context)
+            else:
+                await update.message.reply_text(f"❌ {error_msg}")
+        except ValueError:
+            await update.message.reply_text("❌ Введите корректное целое число")
+    
+    elif user_data.get('step') == 'waiting_parallel':
+        try:
+            parallel = int(text)
+            is_valid, error_msg = balancer.validate_configuration(1, parallel)  # Проверяем только parallel
+            if is_valid:
+                user_data['parallel'] = parallel
+                user_data['step'] = 'config'
+                await update.message.reply_text(f"✅ Установлено параллельно: {parallel}P")
+                await show_config_menu(update, context)
+            else:
+                await update.message.reply_text(f"❌ {error_msg}")
+        except ValueError:
+            await update.message.reply_text("❌ Введите корректное целое число")
+    
+    elif user_data.get('step') == 'waiting_voltage':
+        try:
+            voltage = float(text.replace(',', '.'))  # Поддержка запятых как разделителей
+            is_valid, error_msg = balancer.validate_voltage(voltage)
+            if is_valid:
+                user_data['voltage'] = voltage
+                user_data['step'] = 'config'
+                await update.message.reply_text(f"✅ Установлено напряжение: {voltage} В")
+                await show_config_menu(update, context)
+            else:
+                await update.message.reply_text(f"❌ {error_msg}")
+        except ValueError:
+            await update.message.reply_text("❌ Введите корректное число (например: 3.7)")
+    
+    elif user_data.get('step') == 'waiting_capacities':
+        try:
+            # Парсим емкости (и сопротивления в формате емкость/мОм), поддерживаем разные разделители
+            capacities, resistances = balancer.parse_cell_records(text)
+            
+            required_cells = user_data.get('series', 0) * user_data.get('parallel', 0)
+            
+            if not required_cells:
+                await update.message.reply_text("❌ Сначала настройте конфигурацию (S и P)")
+                return
+            
+            if len(capacities) != required_cells:
+                await update.message.reply_text(
+                    f"❌ Для конфигурации {user_data['series']}S{user_data['parallel']}P "
+                    f"нужно {required_cells} аккумуляторов\n"
+                    f"Вы ввели: {len(capacities)}\n\n"
+                    f"Введите {required_cells} значений через пробел:"
+                )
+                return
+            
+            # Валидация емкостей
+            is_valid, error_msg = balancer.validate_capacities(capacities)
+            if not is_valid:
+                await update.message.reply_text(
+                    f"❌ {error_msg}\n\n"
+                    f"Пожалуйста, введите корректные значения:"
+                )
+                return
+            
+            if resistances is not None:
+                is_valid, error_msg = balancer.validate_resistances(resistances, len(capacities))
+                if not is_valid:
+                    await update.message.reply_text(
+                        f"❌ {error_msg}\n\n"
+                        f"Пожалуйста, введите корректные значения:"
+                    )
+                    return
+            
+            user_data['capacities'] = capacities
+            user_data['resistances'] = resistances
+            user_data['step'] = 'config'
+            
+            summary = (
+                f"✅ Введены емкости {len(capacities)} аккумуляторов\n"
+                f"📊 Диапазон: {min(capacities)}-{max(capacities)} мАч\n"
+                f"📊 Средняя: {sum(capacities)/len(capacities):.0f} мАч"
+            )
+            if resistances is not None:
+                summary += f"\n🔌 Сопротивление: {min(resistances):g}-{max(resistances):g} мОм"
+            await update.message.reply_text(summary)
+            await show_config_menu(update, context)
+            
+        except ValueError as e:
+            await update.message.reply_text(
+                "❌ Введите корректные числа через пробел\n\n"
+                "Пример: 2500 2550 2600 2450 2520 2480 2580 2420\n"
+                "С сопротивлением: 2500/45 2550/38 2600/41 ..."
+            )
+        except Exception as e:
+            logger.error(f"Capacity input error: {e}")
+            await update.message.reply_text(
+                "❌ Произошла ошибка при обработке данных. Попробуйте снова."
+            )
+    
+    else:
+        # Если сообщение не соответствует ни одному ожидаемому состоянию
+        await update.message.reply_text(
+            "🤔 Я не понял ваше сообщение. Используйте кнопки меню или команды:\n\n"
+            "/start - начать работу\n"
+            "/reset - сбросить настройки\n"
+            "/status - показать состояние\n"
+            "/cancel - отменить операцию\n"
+            "/help - помощь"
+        )
+
+async def show_config_menu(update, context):
+    """Показать меню конфигурации"""
+    user_id = update.effective_user.id
+    user_data = sessions.get(user_id, {})
+    
+    keyboard = [
+        [InlineKeyboardButton("🔢 Количество последовательно (S)", callback_data="set_series")],
+        [InlineKeyboardButton("🔢 Количество параллельно (P)", callback_data="set_parallel")],
+        [InlineKeyboardButton("⚡ Напряжение аккумулятора", callback_data="set_voltage")],
+        [InlineKeyboardButton("📝 Ввести емкости", callback_data="set_capacities")],
+        [InlineKeyboardButton("📊 Рассчитать сборку", callback_data="calculate")],
+        [InlineKeyboardButton("🔙 Назад", callback_data="back")]
+    ]
+    reply_markup = InlineKeyboardMarkup(keyboard)
+    
+    config_text = f"""⚙️ Текущая конфигурация:
+
+🔢 Последовательно (S): {user_data.get('series', 'не задано')}
+🔢 Параллельно (P): {user_data.get('parallel', 'не задано')}
+⚡ Напряжение: {user_data.get('voltage', 3.7)} В
+📊 Аккумуляторов: {len(user_data.get('capacities', []))} шт
+
+Выберите параметр для настройки:"""
+    
+    # Просто используем try-except для определения типа
+    try:
+        # Если это CallbackQuery
+        await update.edit_message_text(config_text, reply_markup=reply_markup)
+    except AttributeError:
+        # Если это Update
+        await update.message.reply_text(config_text, reply_markup=reply_markup)
@@ -0,0 +1,108 @@
+"""Учет выполняющихся расчетов, снимок при остановке и возобновление после запуска"""
+import asyncio
+import itertools
+import json
+import logging
+import os
+import time
+from typing import Coroutine, Dict, List, Set, Tuple
+
+logger = logging.getLogger(__name__)
+
+class JobTracker:
+    """Реестр выполняющихся расчетов
+
+    Каждый расчет - отдельная задача asyncio с описанием, достаточным для
+    повторного запуска: параметры сборки и сообщение с прогресс-баром.
+    У пользователя одновременно выполняется не больше одного расчета.
+    """
+
+    def __init__(self, snapshot_path: str):
+        self.snapshot_path = snapshot_path
+        self.accepting = True
+        self._jobs: Dict[int, Tuple[asyncio.Task, Dict]] = {}
+        self._ids = itertools.count(1)
+        self._users: Set[int] = set()
+
+    @property
+    def running(self) -> int:
+        return len(self._jobs)
+
+    def reserve(self, user_id: int) -> bool:
+        """Занять расчет пользователя; False, если у него уже идет расчет
+
+        Вызывается до первого await обработчика, поэтому проверка и занятие
+        атомарны относительно других обновлений того же пользователя.
+        """
+        if user_id in self._users:
+            return False
+        self._users.add(user_id)
+        return True
+
+    def release(self, user_id: int) -> None:
+        """Освобождение занятого reserve; запущенный расчет держит его до завершения"""
+        if not any(descriptor['user_id'] == user_id for _, descriptor in self._jobs.values()):
+            self._users.discard(user_id)
+
+    def start(self, coro: Coroutine, descriptor: Dict) -> asyncio.Task:
+        """Запуск расчета как отдельной задачи с регистрацией в реестре"""
+        job_id = next(self._ids)
+        user_id = descriptor['user_id']
+        task = asyncio.ensure_future(coro)
+        self._jobs[job_id] = (task, descriptor)
+        self._users.add(user_id)
+        
+        def on_done(_) -> None:
+            self._jobs.pop(job_id, None)
+            self._users.discard(user_id)
+        
+        task.add_done_callback(on_done)
+        return task
+
+    async def drain(self, timeout: float) -> List[Dict]:
+        """Ожидание текущих расчетов не дольше timeout
+
+        Незавершенные к сроку расчеты отменяются, возвращаются их описания.
+        """
+        tasks = [task for task, _ in self._jobs.values()]
+        if tasks:
+            await asyncio.wait(tasks, timeout=timeout)
+        
+        unfinished = [(task, descriptor) for task, descriptor in self._jobs.values() if not task.done()]
+        for task, _ in unfinished:
+            task.cancel()
+        if unfinished:
+            # Дожидаемся отмены, чтобы задачи не успели изменить сообщения позже
+            await asyncio.gather(*(task for task, _ in unfinished), return_exceptions=True)
+        return [descriptor for _, descriptor in unfinished]
+
+    def save_snapshot(self, descriptors: List[Dict]) -> None:
+        """Атомарная запись незавершенных расчетов на диск"""
+        directory = os.path.dirname(self.snapshot_path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        tmp_path = f"{self.snapshot_path}.tmp"
+        with open(tmp_path, 'w', encoding='utf-8') as snapshot:
+            json.dump({'saved': time.time(), 'jobs': descriptors}, snapshot, ensure_ascii=False)
+        os.replace(tmp_path, self.snapshot_path)
+        logger.info(f"Сохранено незавершенных расчетов: {len(descriptors)} -> {self.snapshot_path}")
+
+    def load_snapshot(self, max_age: float) -> List[Dict]:
+        """Чтение и удаление снимка; слишком старые расчеты отбрасываются"""
+        try:
+            with open(self.snapshot_path, encoding='utf-8') as snapshot:
+                data = json.load(snapshot)
+        except FileNotFoundError:
+            return []
+        except (OSError, ValueError) as e:
+            logger.error(f"Не удалось прочитать снимок расчетов: {e}")
+            return []
+        finally:
+            if os.path.exists(self.snapshot_path):
+                os.remove(self.snapshot_path)
+        
+        now = time.time()
+        jobs = [job for job in data.get('jobs', []) if now - job.get('created', 0) <= max_age]
+        if len(jobs) != len(data.get('jobs', [])):
+            logger.info(f"Пропущено устаревших расчетов: {len(data.get('jobs', [])) - len(jobs)}")
+        return jobs
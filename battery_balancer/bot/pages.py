@@ -0,0 +1,101 @@
+"""Постраничный вывод схемы распайки"""
+from typing import Dict, List
+
+from telegram import InlineKeyboardButton, InlineKeyboardMarkup
+
+from battery_balancer.bot.runtime import balancer
+from battery_balancer.bot.settings import TELEGRAM_MESSAGE_LIMIT
+from battery_balancer.engine import text_length
+
+def result_summary(series: int, parallel: int, stats: Dict) -> str:
+    """Сводка результата расчета над первой страницей схемы"""
+    result_text = f"""✅ РАСЧЕТ ЗАВЕРШЕН
+
+📊 ОБЩАЯ ИНФОРМАЦИЯ:
+🔋 Конфигурация: {series}S{parallel}P
+⚡ Напряжение: {stats['total_voltage']:.1f} В
+🔋 Емкость: {stats['total_capacity']:.0f} мАч
+⚡ Энергия: {stats['total_energy']:.2f} Вт·ч
+🔢 Аккумуляторов: {stats['total_cells']} шт
+
+📈 СТАТИСТИКА БАЛАНСИРОВКИ:
+📊 Средняя емкость группы: {stats['avg_capacity']:.0f} мАч
+⚖️ Максимальное отклонение: {stats['max_deviation']:.0f} мАч
+📊 Среднее отклонение: {stats['avg_deviation']:.0f} мАч
+✅ Качество балансировки: {stats['balance_quality']:.1f}%
+📐 Стандартное отклонение: {stats['std_deviation']:.1f} мАч
+↔️ Размах емкостей групп: {stats['capacity_range']:.0f} мАч
+📊 Отклонение p95: {stats['deviation_p95']:.0f} мАч
+🔋 Энергия до разряда слабейшей группы: {stats['usable_energy']:.2f} Вт·ч"""
+    
+    if 'ir_spread' in stats:
+        result_text += (
+            f"\n🔌 Среднее сопротивление группы: {stats['avg_group_ir']:.2f} мОм"
+            f"\n🔌 Разброс сопротивления групп: {stats['ir_spread']:.2f} мОм"
+        )
+    
+    robustness = stats.get('robustness')
+    if robustness:
+        result_text += f"""
+
+🎲 УСТОЙЧИВОСТЬ К ПОГРЕШНОСТИ ±{robustness['noise'] * 100:.0f}%:
+⚖️ Макс. отклонение p50/p95/p99: {robustness['max_deviation_p50']:.0f} / {robustness['max_deviation_p95']:.0f} / {robustness['max_deviation_p99']:.0f} мАч
+✅ Качество балансировки p50/p5: {robustness['balance_quality_p50']:.1f}% / {robustness['balance_quality_p5']:.1f}%"""
+    
+    return result_text
+
+class DiagramPager:
+    """Кэш страниц схемы распайки одного результата
+
+    Первая страница рендерится сразу, остальные - по мере перелистывания.
+    """
+
+    # Запас под заголовок страницы и служебный текст
+    PAGE_MARGIN = 200
+
+    def __init__(self, result_id: int, summary: str, groups: List[Dict], stats: Dict):
+        self.result_id = result_id
+        self.summary = summary
+        page_limit = TELEGRAM_MESSAGE_LIMIT - self.PAGE_MARGIN
+        first_page_limit = page_limit - text_length(summary)
+        self._pages_iter = balancer.iter_wiring_pages(groups, stats, page_limit, first_page_limit)
+        self._pages: List[str] = []
+
+    def _render_until(self, index: int) -> None:
+        while self._pages_iter is not None and len(self._pages) <= index:
+            page = next(self._pages_iter, None)
+            if page is None:
+                self._pages_iter = None
+            else:
+                self._pages.append(page)
+
+    def has_page(self, index: int) -> bool:
+        if index < 0:
+            return False
+        self._render_until(index)
+        return index < len(self._pages)
+
+    def page_text(self, index: int) -> str:
+        """Текст сообщения для страницы с номером index (с нуля)"""
+        self._render_until(index)
+        if index == 0:
+            return f"{self.summary}\n\n{self._pages[0]}"
+        return f"📋 Схема распайки, стр. {index + 1}\n\n{self._pages[index]}"
+
+    def reply_markup(self, index: int) -> InlineKeyboardMarkup:
+        """Клавиатура результата с навигацией по страницам"""
+        keyboard = []
+        navigation = []
+        if self.has_page(index - 1):
+            navigation.append(InlineKeyboardButton("◀", callback_data=f"page:{self.result_id}:{index - 1}"))
+        if self.has_page(index + 1):
+            navigation.append(InlineKeyboardButton("▶", callback_data=f"page:{self.result_id}:{index + 1}"))
+        if navigation:
+            keyboard.append(navigation)
+        keyboard.append([InlineKeyboardButton("💾 Скачать CSV", callback_data="download_csv")])
+        keyboard.append([
+            InlineKeyboardButton("📦 JSON", callback_data="download:json"),
+            InlineKeyboardButton("🛠 Для стапеля", callback_data="download:jig")
+        ])
+        keyboard.append([InlineKeyboardButton("🔄 Новый расчет", callback_data="back")])
+        return InlineKeyboardMarkup(keyboard)
@@ -0,0 +1,132 @@
+"""Выборочное профилирование расчетов и учет самых медленных задач
+
+Выбранный расчет проходит шаги движка из run_calculation (балансировка,
+статистика, анализ устойчивости, первая страница схемы) в процессе пула
+расчетов под cProfile и, по желанию, tracemalloc. Процесс пула не импортирует
+telegram и объекты бота: сводку и клавиатуру строит сам бот. Рядом с .prof
+и .snapshot сохраняется .json с параметрами задачи.
+"""
+import asyncio
+import cProfile
+import heapq
+import itertools
+import json
+import logging
+import os
+import random
+import time
+import tracemalloc
+from concurrent.futures import Executor
+from typing import Dict, List, Optional, Tuple
+
+from battery_balancer.engine import BatteryBalancer, solve_job
+
+logger = logging.getLogger(__name__)
+
+class JobProfiler:
+    """Профилировщик расчетов с настройкой во время работы"""
+
+    def __init__(self, sample_rate: float = 0.0, trace_memory: bool = False,
+                 output_dir: str = os.path.join('logs', 'profiles'), top_n: int = 10):
+        self.sample_rate = sample_rate
+        self.trace_memory = trace_memory
+        self.output_dir = output_dir
+        self.top_n = top_n
+        # Минимальная куча (длительность, порядковый номер, описание задачи)
+        self._slowest: List[Tuple[float, int, Dict]] = []
+        self._sequence = itertools.count()
+        self._profile_ids = itertools.count(1)
+        self.profiled_jobs = 0
+
+    def should_sample(self) -> bool:
+        """Профилировать ли очередной расчет"""
+        return self.sample_rate > 0 and random.random() < self.sample_rate
+
+    def record(self, duration: float, job: Dict) -> None:
+        """Учет длительности расчета в списке самых медленных
+        
+        Профилированные расчеты не учитываются: их время включает накладные
+        расходы cProfile и не сравнимо с обычными расчетами.
+        """
+        if self.top_n <= 0 or job.get('profile'):
+            return
+        entry = (duration, next(self._sequence), dict(job, duration=duration, finished=time.time()))
+        if len(self._slowest) < self.top_n:
+            heapq.heappush(self._slowest, entry)
+        elif duration > self._slowest[0][0]:
+            heapq.heapreplace(self._slowest, entry)
+
+    def slowest(self) -> List[Dict]:
+        """Самые медленные расчеты по убыванию длительности"""
+        return [job for _, _, job in sorted(self._slowest, reverse=True)]
+
+    async def run_profiled(self, executor: Optional[Executor], job: Dict, capacities: List[int],
+                           resistances: Optional[List[float]], bucket_width: int, ir_weight: float,
+                           robustness_noise: float, robustness_samples: int,
+                           page_limit: int) -> Tuple[List[Dict], Dict]:
+        """Расчет задачи под профилировщиком в процессе пула
+        
+        Возвращает группы и статистику (с анализом устойчивости); в job
+        записываются базовый путь файлов профиля и длительности шагов.
+        """
+        os.makedirs(self.output_dir, exist_ok=True)
+        base_path = os.path.join(
+            self.output_dir,
+            f"{time.strftime('%Y%m%d-%H%M%S')}-{next(self._profile_ids)}-{job['user_id']}-{job['series']}S{job['parallel']}P"
+        )
+        groups, stats, timings = await asyncio.get_running_loop().run_in_executor(
+            executor, profile_job, base_path, self.trace_memory, job, capacities, resistances,
+            bucket_width, ir_weight, robustness_noise, robustness_samples, page_limit
+        )
+        job.update(timings, profile=base_path)
+        
+        self.profiled_jobs += 1
+        logger.info(f"Профиль расчета сохранен: {base_path}.prof ({timings['profiled_seconds']:.3f} с)")
+        return groups, stats
+
+def profile_job(base_path: str, trace_memory: bool, job: Dict, capacities: List[int],
+                resistances: Optional[List[float]], bucket_width: int, ir_weight: float,
+                robustness_noise: float, robustness_samples: int,
+                page_limit: int) -> Tuple[List[Dict], Dict, Dict]:
+    """Шаги движка из run_calculation под cProfile (точка входа для процессов пула)
+    
+    Первая страница схемы рендерится с лимитом page_limit: длину сводки над ней
+    знает только бот. Возвращает группы, статистику и длительности шагов.
+    """
+    balancer = BatteryBalancer()
+    series, parallel, voltage = job['series'], job['parallel'], job['voltage']
+    
+    # Процесс пула переиспользуется, поэтому трассировка включается на один расчет
+    started_tracing = trace_memory and not tracemalloc.is_tracing()
+    if started_tracing:
+        tracemalloc.start()
+    profile = cProfile.Profile()
+    timings = {}
+    started = time.perf_counter()
+    
+    profile.enable()
+    try:
+        groups = solve_job(capacities, series, parallel, bucket_width, resistances, ir_weight)
+        timings['solve_seconds'] = time.perf_counter() - started
+        
+        report_started = time.perf_counter()
+        stats = balancer.calculate_statistics(groups, series, voltage)
+        if robustness_samples > 0:
+            stats['robustness'] = balancer.analyze_robustness(groups, robustness_noise, robustness_samples)
+        # Первая и следующая страницы, как при выводе результата с навигацией
+        pages = balancer.iter_wiring_pages(groups, stats, page_limit)
+        next(pages, None)
+        next(pages, None)
+        timings['report_seconds'] = time.perf_counter() - report_started
+    finally:
+        profile.disable()
+        timings['profiled_seconds'] = time.perf_counter() - started
+        profile.dump_stats(f"{base_path}.prof")
+        if trace_memory and tracemalloc.is_tracing():
+            tracemalloc.take_snapshot().dump(f"{base_path}.snapshot")
+            if started_tracing:
+                tracemalloc.stop()
+        with open(f"{base_path}.json", 'w', encoding='utf-8') as meta:
+            json.dump(dict(job, **timings, trace_memory=trace_memory), meta, ensure_ascii=False, indent=2)
+    
+    return groups, stats, timings
@@ -0,0 +1,89 @@
+"""Общие объекты процесса бота: балансировщик, решатель, сессии и пул процессов"""
+import asyncio
+from concurrent.futures import ProcessPoolExecutor
+from typing import Dict, List, Optional, Tuple
+
+from battery_balancer.bot import settings
+from battery_balancer.bot.lifecycle import JobTracker
+from battery_balancer.bot.profiling import JobProfiler
+from battery_balancer.bot.sessions import SessionStore
+from battery_balancer.bot.solver import SingleFlightSolver
+from battery_balancer.engine import BatteryBalancer, explore_job
+
+# Создаем экземпляр балансировщика
+balancer = BatteryBalancer()
+solver = SingleFlightSolver(
+    cache_size=settings.RESULT_CACHE_SIZE,
+    bucket_width=settings.CAPACITY_BUCKET_WIDTH,
+    ir_weight=settings.IR_WEIGHT
+)
+profiler = JobProfiler(
+    sample_rate=settings.PROFILE_SAMPLE_RATE,
+    trace_memory=settings.PROFILE_TRACEMALLOC,
+    output_dir=settings.PROFILE_DIR,
+    top_n=settings.PROFILE_TOP_N
+)
+jobs = JobTracker(settings.JOBS_SNAPSHOT_FILE)
+sessions = SessionStore(settings.SESSION_IDLE_SECONDS, settings.SESSION_MAX_COUNT)
+
+def start_solver_pool(workers: Optional[int] = None, mp_context=None) -> ProcessPoolExecutor:
+    """Пул процессов для расчетов, чтобы не блокировать цикл событий"""
+    solver.workers = workers or settings.SOLVER_WORKERS
+    solver.executor = ProcessPoolExecutor(max_workers=solver.workers, mp_context=mp_context)
+    return solver.executor
+
+def shutdown_solver_pool() -> None:
+    """Остановка пула: очередь отменяется (незавершенные расчеты уже в снимке),
+    ожидаются только задачи, которые процессы пула выполняют прямо сейчас"""
+    if solver.executor is not None:
+        solver.executor.shutdown(wait=True, cancel_futures=True)
+        solver.executor = None
+
+async def explore_layouts(capacities: List[int], voltage: float, min_voltage: Optional[float] = None,
+                          max_voltage: Optional[float] = None, top: int = 10) -> Tuple[List[Dict], Dict]:
+    """Параллельный подбор конфигураций S x P с отсечением по верхней оценке
+    
+    Конфигурации считаются пачками в пуле процессов в порядке убывания энергии.
+    Балл = энергия x качество балансировки, энергия - его верхняя оценка, поэтому
+    как только оценка не превышает балла top-го результата, остальные отсекаются.
+    """
+    layouts = balancer.enumerate_layouts(capacities, voltage, min_voltage, max_voltage)
+    loop = asyncio.get_running_loop()
+    # Пачка по числу процессов пула (в шарде пул меньше SOLVER_WORKERS)
+    batch_size = solver.workers
+    results: List[Dict] = []
+    position = 0
+    
+    while position < len(layouts):
+        threshold = results[top - 1]['score'] if len(results) >= top else float('-inf')
+        batch = []
+        while position < len(layouts) and len(batch) < batch_size:
+            if layouts[position]['energy'] <= threshold:
+                position = len(layouts)
+                break
+            batch.append(layouts[position])
+            position += 1
+        if not batch:
+            break
+        
+        solved = await asyncio.gather(*(
+            loop.run_in_executor(solver.executor, explore_job, layout['capacities'],
+                                 layout['series'], layout['parallel'], voltage)
+            for layout in batch
+        ))
+        for layout, stats in zip(batch, solved):
+            results.append({
+                'series': layout['series'],
+                'parallel': layout['parallel'],
+                'leftover': layout['leftover'],
+                'pack_voltage': layout['pack_voltage'],
+                'total_capacity': stats['total_capacity'],
+                'total_energy': stats['total_energy'],
+                'max_deviation': stats['max_deviation'],
+                'balance_quality': stats['balance_quality'],
+                'score': stats['total_energy'] * stats['balance_quality'] / 100
+            })
+        results.sort(key=lambda result: result['score'], reverse=True)
+    
+    summary = {'layouts': len(layouts), 'solved': len(results), 'pruned': len(layouts) - len(results)}
+    return results[:top], summary
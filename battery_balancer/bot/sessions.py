@@ -0,0 +1,150 @@
+"""Компактное хранилище сессий пользователей с вытеснением простаивающих"""
+import asyncio
+import logging
+import sys
+import time
+from array import array
+from collections import OrderedDict
+from typing import Callable, Dict, Iterable, Optional, Union
+
+logger = logging.getLogger(__name__)
+
+class Session:
+    """Состояние диалога пользователя
+
+    Поля в __slots__ вместо словаря, емкости - в array('H') (2 байта на
+    аккумулятор вместо объекта int), сопротивления - в array('d').
+    Доступ как к словарю (session['series'], session.get('voltage')) оставлен
+    для обработчиков.
+    """
+
+    __slots__ = ('step', 'series', 'parallel', 'voltage', '_capacities', '_resistances', 'last_active')
+
+    FIELDS = frozenset(('step', 'series', 'parallel', 'voltage', 'capacities', 'resistances'))
+
+    def __init__(self, step: str = 'config', series: Optional[int] = None, parallel: Optional[int] = None,
+                 voltage: float = 3.7, capacities: Iterable[int] = (),
+                 resistances: Optional[Iterable[float]] = None):
+        self.step = step
+        self.series = series
+        self.parallel = parallel
+        self.voltage = voltage
+        self.capacities = capacities
+        self.resistances = resistances
+        self.last_active = time.monotonic()
+
+    @property
+    def capacities(self) -> array:
+        return self._capacities
+
+    @capacities.setter
+    def capacities(self, values: Iterable[int]) -> None:
+        self._capacities = array('H', values)
+
+    @property
+    def resistances(self) -> Optional[array]:
+        return self._resistances
+
+    @resistances.setter
+    def resistances(self, values: Optional[Iterable[float]]) -> None:
+        self._resistances = array('d', values) if values is not None else None
+
+    def __getitem__(self, key: str):
+        if key not in self.FIELDS:
+            raise KeyError(key)
+        return getattr(self, key)
+
+    def __setitem__(self, key: str, value) -> None:
+        if key not in self.FIELDS:
+            raise KeyError(key)
+        setattr(self, key, value)
+
+    def get(self, key: str, default=None):
+        return getattr(self, key) if key in self.FIELDS else default
+
+    def nbytes(self) -> int:
+        """Память сессии вместе с массивами"""
+        size = sys.getsizeof(self) + sys.getsizeof(self._capacities)
+        if self._resistances is not None:
+            size += sys.getsizeof(self._resistances)
+        return size
+
+class SessionStore:
+    """Сессии пользователей в порядке последней активности
+
+    Обращение к сессии переносит ее в конец OrderedDict, поэтому самые давние
+    сессии всегда в начале: вытеснение по простою и по лимиту количества
+    просматривает только вытесняемые записи. on_evict вызывается для каждого
+    вытесненного пользователя (например, чтобы удалить его результаты).
+    """
+
+    def __init__(self, idle_seconds: float = 86400, max_sessions: int = 10000):
+        self.idle_seconds = idle_seconds
+        self.max_sessions = max_sessions
+        self.on_evict: Optional[Callable[[int], None]] = None
+        self.evicted = 0
+        self._sessions: 'OrderedDict[int, Session]' = OrderedDict()
+
+    def __len__(self) -> int:
+        return len(self._sessions)
+
+    def __contains__(self, user_id: int) -> bool:
+        return user_id in self._sessions
+
+    def __getitem__(self, user_id: int) -> Session:
+        session = self._sessions[user_id]
+        session.last_active = time.monotonic()
+        self._sessions.move_to_end(user_id)
+        return session
+
+    def __setitem__(self, user_id: int, session: Union[Session, Dict]) -> None:
+        if not isinstance(session, Session):
+            session = Session(**session)
+        session.last_active = time.monotonic()
+        self._sessions[user_id] = session
+        self._sessions.move_to_end(user_id)
+
+        while len(self._sessions) > self.max_sessions:
+            self._evict(next(iter(self._sessions)))
+
+    def __delitem__(self, user_id: int) -> None:
+        del self._sessions[user_id]
+
+    def get(self, user_id: int, default=None):
+        return self[user_id] if user_id in self._sessions else default
+
+    def _evict(self, user_id: int) -> None:
+        del self._sessions[user_id]
+        self.evicted += 1
+        if self.on_evict is not None:
+            try:
+                self.on_evict(user_id)
+            except Exception as e:
+                logger.warning(f"Session eviction callback failed for {user_id}: {e}")
+
+    def sweep(self) -> int:
+        """Вытеснение сессий без активности дольше idle_seconds"""
+        deadline = time.monotonic() - self.idle_seconds
+        evicted = 0
+        while self._sessions:
+            user_id, session = next(iter(self._sessions.items()))
+            if session.last_active > deadline:
+                break
+            self._evict(user_id)
+            evicted += 1
+        return evicted
+
+    def memory_usage(self) -> int:
+        """Примерный объем памяти сессий в байтах"""
+        return sys.getsizeof(self._sessions) + sum(session.nbytes() for session in self._sessions.values())
+
+async def run_sweeper(store: SessionStore, interval: float) -> None:
+    """Периодическое вытеснение простаивающих сессий"""
+    while True:
+        await asyncio.sleep(interval)
+        evicted = store.sweep()
+        if evicted:
+            logger.info(
+                f"Вытеснено сессий: {evicted}, активных: {len(store)}, "
+                f"память: {store.memory_usage() / 1024:.1f} КБ"
+            )
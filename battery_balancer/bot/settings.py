@@ -0,0 +1,55 @@
+"""Настройки бота из переменных окружения
+
+Модуль читается при создании приложения, после загрузки .env.
+"""
+import os
+
+# Лимит длины сообщения Telegram
+TELEGRAM_MESSAGE_LIMIT = 4096
+
+# Файл лога
+LOG_FILE = os.getenv('LOG_FILE', 'battery_bot.log')
+
+# Количество процессов в пуле расчетов
+SOLVER_WORKERS = int(os.getenv('SOLVER_WORKERS', '0')) or os.cpu_count() or 1
+
+# Кэш результатов, квантование емкостей и вес внутреннего сопротивления
+RESULT_CACHE_SIZE = int(os.getenv('RESULT_CACHE_SIZE', '256'))
+CAPACITY_BUCKET_WIDTH = int(os.getenv('CAPACITY_BUCKET_WIDTH', '0'))
+IR_WEIGHT = float(os.getenv('IR_WEIGHT', '0.1'))
+
+# Одновременно обрабатываемые обновления (1 - последовательная обработка).
+# Без параллельной обработки расчеты разных пользователей не пересекаются
+# и дедупликация одинаковых расчетов не срабатывает; обновления одного
+# пользователя тоже идут параллельно, повторный расчет отсекает JobTracker
+CONCURRENT_UPDATES = int(os.getenv('CONCURRENT_UPDATES', '32'))
+
+# Анализ устойчивости: погрешность измерения емкостей (%) и число выборок (0 - отключен)
+ROBUSTNESS_NOISE = float(os.getenv('ROBUSTNESS_NOISE', '4')) / 100
+ROBUSTNESS_SAMPLES = int(os.getenv('ROBUSTNESS_SAMPLES', '2000'))
+
+# Администраторы бота (user_id через запятую)
+ADMIN_IDS = frozenset(int(user_id) for user_id in os.getenv('ADMIN_IDS', '').replace(' ', '').split(',') if user_id)
+
+# Профилирование: доля профилируемых расчетов (0-1), трассировка памяти,
+# каталог для .prof/.snapshot файлов и размер списка самых медленных расчетов
+PROFILE_SAMPLE_RATE = float(os.getenv('PROFILE_SAMPLE_RATE', '0'))
+PROFILE_TRACEMALLOC = os.getenv('PROFILE_TRACEMALLOC', '0').lower() in ('1', 'true', 'yes', 'on')
+PROFILE_DIR = os.getenv('PROFILE_DIR', os.path.join('logs', 'profiles'))
+PROFILE_TOP_N = int(os.getenv('PROFILE_TOP_N', '10'))
+
+# Корректная остановка: сколько ждать текущие расчеты, куда сохранять
+# незавершенные и насколько старые из них возобновлять после запуска
+SHUTDOWN_GRACE_SECONDS = float(os.getenv('SHUTDOWN_GRACE_SECONDS', '20'))
+JOBS_SNAPSHOT_FILE = os.getenv('JOBS_SNAPSHOT_FILE', os.path.join('logs', 'pending_jobs.json'))
+RESUME_MAX_AGE_SECONDS = float(os.getenv('RESUME_MAX_AGE_SECONDS', '3600'))
+
+# Число процессов-шардов; при значении больше 1 обновления получает
+# диспетчер и распределяет их по процессам по user_id
+BOT_SHARDS = int(os.getenv('BOT_SHARDS', '1'))
+
+# Сессии пользователей: простой до вытеснения, максимум сессий в памяти
+# и период фоновой очистки (вместе с сессией удаляются и результаты)
+SESSION_IDLE_SECONDS = float(os.getenv('SESSION_IDLE_SECONDS', '86400'))
+SESSION_MAX_COUNT = int(os.getenv('SESSION_MAX_COUNT', '10000'))
+SESSION_SWEEP_SECONDS = float(os.getenv('SESSION_SWEEP_SECONDS', '300'))
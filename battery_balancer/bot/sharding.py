@@ -0,0 +1,224 @@
+"""Многопроцессный режим: диспетчер обновлений и процессы-шарды
+
+Диспетчер получает обновления одним опросом getUpdates и по user_id
+пересылает их через канал (multiprocessing.Pipe) одному из процессов-шардов.
+Каждый шард - полноценное приложение бота со своими обработчиками, пулом
+расчетов и состоянием сессий. Обновления одного пользователя всегда попадают
+в один процесс, поэтому состояние сессий не делится между процессами,
+а разные пользователи распределяются по ядрам.
+"""
+import asyncio
+import glob
+import logging
+import multiprocessing
+import os
+import signal
+from multiprocessing.connection import Connection
+from typing import Callable, List, Optional, Tuple
+
+from battery_balancer.bot import settings
+
+logger = logging.getLogger(__name__)
+
+Worker = Tuple[multiprocessing.Process, Connection]
+
+# Сколько ждать готовности шардов перед опросом обновлений
+SHARD_START_TIMEOUT = 60
+
+def shard_for(user_id: Optional[int], shards: int) -> int:
+    """Номер шарда пользователя; обновления без пользователя идут в шард 0"""
+    return (user_id or 0) % shards
+
+def shard_snapshot_path(shard: int) -> str:
+    """Отдельный снимок незавершенных расчетов для каждого шарда"""
+    root, ext = os.path.splitext(settings.JOBS_SNAPSHOT_FILE)
+    return f"{root}.shard{shard}{ext}"
+
+def reshard_snapshots(shards: int) -> None:
+    """Перераспределение снимков незавершенных расчетов под текущее число шардов
+
+    После смены BOT_SHARDS снимки прежних шардов (и однопроцессного режима)
+    объединяются и раскладываются по shard_for заново, чтобы расчет
+    возобновился в процессе, который хранит результаты пользователя.
+    Вызывается до запуска шардов; при shards == 1 все сводится в общий снимок.
+    """
+    from battery_balancer.bot.lifecycle import JobTracker
+
+    root, ext = os.path.splitext(settings.JOBS_SNAPSHOT_FILE)
+    paths = [settings.JOBS_SNAPSHOT_FILE] + sorted(glob.glob(f"{glob.escape(root)}.shard*{ext}"))
+    descriptors = []
+    for path in paths:
+        if os.path.exists(path):
+            # Устаревшие расчеты отбросит load_snapshot при возобновлении
+            descriptors.extend(JobTracker(path).load_snapshot(float('inf')))
+    if not descriptors:
+        return
+
+    targets = {}
+    for descriptor in descriptors:
+        shard = shard_for(descriptor['user_id'], shards)
+        targets.setdefault(shard, []).append(descriptor)
+    for shard, shard_descriptors in sorted(targets.items()):
+        path = shard_snapshot_path(shard) if shards > 1 else settings.JOBS_SNAPSHOT_FILE
+        JobTracker(path).save_snapshot(shard_descriptors)
+    logger.info(f"Незавершенные расчеты распределены по шардам: {len(descriptors)} -> {shards}")
+
+async def _receive_updates(application, connection: Connection) -> None:
+    """Передача обновлений от диспетчера в очередь приложения
+
+    None или закрытый канал означают остановку.
+    """
+    from telegram import Update
+
+    from battery_balancer.bot import handlers
+
+    loop = asyncio.get_running_loop()
+    while True:
+        try:
+            data = await loop.run_in_executor(None, connection.recv)
+        except EOFError:
+            data = None
+        if data is None:
+            await handlers.graceful_shutdown(application)
+            return
+        await application.update_queue.put(Update.de_json(data, application.bot))
+
+def run_shard(shard: int, shards: int, connection: Connection, token: str, base_url: Optional[str],
+              ready=None) -> None:
+    """Процесс-шард: приложение бота, получающее обновления от диспетчера
+
+    ready (multiprocessing.Event) устанавливается, когда приложение запущено.
+    """
+    # SIGINT от терминала приходит всей группе процессов, остановкой управляет диспетчер
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+
+    from battery_balancer.bot.app import build_application, setup_logging
+    from battery_balancer.bot.runtime import jobs, start_solver_pool
+
+    setup_logging(settings.LOG_FILE)
+    jobs.snapshot_path = shard_snapshot_path(shard)
+    start_solver_pool(max(1, settings.SOLVER_WORKERS // shards), multiprocessing.get_context('spawn'))
+    application = build_application(token, base_url, handle_signals=False)
+
+    # Тот же порядок запуска и остановки, что в Application.run_polling,
+    # только обновления приходят из канала, а не от Updater
+    loop = asyncio.new_event_loop()
+    asyncio.set_event_loop(loop)
+    receiver = None
+    try:
+        loop.run_until_complete(application.initialize())
+        if application.post_init:
+            loop.run_until_complete(application.post_init(application))
+        loop.run_until_complete(application.start())
+        receiver = loop.create_task(_receive_updates(application, connection))
+        if ready is not None:
+            ready.set()
+        logger.info(f"Шард {shard}/{shards} запущен")
+        loop.run_forever()
+    finally:
+        if receiver is not None and not receiver.done():
+            receiver.cancel()
+        if application.running:
+            loop.run_until_complete(application.stop())
+        if application.post_stop:
+            loop.run_until_complete(application.post_stop(application))
+        loop.run_until_complete(application.shutdown())
+        if application.post_shutdown:
+            loop.run_until_complete(application.post_shutdown(application))
+        loop.close()
+        logger.info(f"Шард {shard}/{shards} остановлен")
+
+async def _dispatch_updates(token: str, base_url: Optional[str], workers: List[Worker],
+                            spawn: Callable[[int], Worker]) -> None:
+    """Опрос getUpdates и пересылка обновлений в шарды до сигнала остановки"""
+    from telegram import Bot, Update
+    from telegram.error import TelegramError
+
+    stop = asyncio.Event()
+    loop = asyncio.get_running_loop()
+    for signum in (signal.SIGINT, signal.SIGTERM):
+        try:
+            loop.add_signal_handler(signum, stop.set)
+        except (NotImplementedError, RuntimeError):
+            logger.warning(f"Обработчик сигнала {signum} недоступен на этой платформе")
+
+    bot = Bot(token, base_url=base_url) if base_url else Bot(token)
+    async with bot:
+        await bot.delete_webhook()
+        offset = None
+        stopping = asyncio.ensure_future(stop.wait())
+
+        while not stop.is_set():
+            poll = asyncio.ensure_future(
+                bot.get_updates(offset=offset, timeout=10, allowed_updates=Update.ALL_TYPES)
+            )
+            await asyncio.wait({poll, stopping}, return_when=asyncio.FIRST_COMPLETED)
+            if not poll.done():
+                # Неполученные обновления придут повторно после перезапуска
+                poll.cancel()
+                break
+
+            try:
+                updates = poll.result()
+            except TelegramError as e:
+                logger.error(f"Ошибка получения обновлений: {e}")
+                await asyncio.sleep(1)
+                continue
+
+            for update in updates:
+                offset = update.update_id + 1
+                user = update.effective_user
+                shard = shard_for(user.id if user else None, len(workers))
+                if not workers[shard][0].is_alive():
+                    logger.error(f"Шард {shard} завершился (код {workers[shard][0].exitcode}), перезапуск")
+                    workers[shard][1].close()
+                    workers[shard] = spawn(shard)
+                workers[shard][1].send(update.to_dict())
+
+        if offset is not None:
+            # Подтверждаем переданные обновления, чтобы они не пришли повторно
+            await bot.get_updates(offset=offset, timeout=0, limit=1)
+
+def run_supervisor(token: str, base_url: Optional[str], shards: int, ready=None) -> None:
+    """Запуск шардов и диспетчера; по SIGINT/SIGTERM шарды останавливаются корректно
+
+    Опрос обновлений начинается после готовности всех шардов, тогда же
+    устанавливается ready (multiprocessing.Event), если он передан.
+    """
+    # spawn: шарды стартуют с чистого интерпретатора и сами создают пул расчетов
+    context = multiprocessing.get_context('spawn')
+    reshard_snapshots(shards)
+
+    def spawn(shard: int, shard_ready=None) -> Worker:
+        receiver, sender = context.Pipe(duplex=False)
+        process = context.Process(
+            target=run_shard, args=(shard, shards, receiver, token, base_url, shard_ready), name=f"shard-{shard}"
+        )
+        process.start()
+        receiver.close()
+        return process, sender
+
+    ready_events = [context.Event() for _ in range(shards)]
+    workers = [spawn(shard, ready_events[shard]) for shard in range(shards)]
+    for shard, shard_ready in enumerate(ready_events):
+        if not shard_ready.wait(SHARD_START_TIMEOUT):
+            logger.warning(f"Шард {shard} не сообщил о готовности за {SHARD_START_TIMEOUT} с")
+    if ready is not None:
+        ready.set()
+    try:
+        asyncio.run(_dispatch_updates(token, base_url, workers, spawn))
+    finally:
+        for _, sender in workers:
+            try:
+                sender.send(None)
+            except OSError:
+                pass
+            sender.close()
+
+        # Шарды дожидаются своих расчетов, запас - на запуск остановки и снимок
+        for shard, (process, _) in enumerate(workers):
+            process.join(settings.SHUTDOWN_GRACE_SECONDS + 10)
+            if process.is_alive():
+                logger.warning(f"Шард {shard} не остановился вовремя, завершение")
+                process.terminate()
+                process.join()
@@ -0,0 +1,103 @@
+"""Запуск расчетов в пуле процессов с дедупликацией одинаковых задач"""
+import asyncio
+import functools
+import logging
+from collections import OrderedDict
+from concurrent.futures import Executor
+from typing import Dict, List, Optional, Tuple
+
+from battery_balancer.engine import solve_job
+
+logger = logging.getLogger(__name__)
+
+class SingleFlightSolver:
+    """Дедупликация одновременных одинаковых расчетов с кэшем результатов
+
+    Задача нормализуется до (S, P, отсортированные емкости): одинаковые наборы
+    аккумуляторов в любом порядке ожидают один общий future, а результат
+    переводится обратно в порядок ячеек каждого пользователя.
+    """
+
+    def __init__(self, executor: Optional[Executor] = None, cache_size: int = 256, bucket_width: int = 0,
+                 ir_weight: float = 0.1):
+        self.executor = executor
+        # Число процессов пула (задается вместе с пулом в start_solver_pool)
+        self.workers = 1
+        self.cache_size = cache_size
+        # Ширина корзины квантования емкостей (0 - без квантования)
+        self.bucket_width = bucket_width
+        # Вес разброса сопротивления групп в цели балансировки
+        self.ir_weight = ir_weight
+        self._inflight: Dict[Tuple, asyncio.Future] = {}
+        self._cache: OrderedDict = OrderedDict()
+        self.metrics = {
+            'requests': 0,
+            'computed': 0,
+            'deduplicated': 0,
+            'cache_hits': 0
+        }
+
+    @property
+    def saved(self) -> int:
+        """Количество сэкономленных расчетов"""
+        return self.metrics['deduplicated'] + self.metrics['cache_hits']
+
+    def normalize(self, capacities: List[int], series: int, parallel: int,
+                  resistances: Optional[List[float]] = None) -> Tuple[Tuple, List[int]]:
+        """Ключ задачи и порядок исходных индексов для отсортированных аккумуляторов"""
+        if resistances is None:
+            order = sorted(range(len(capacities)), key=lambda i: capacities[i])
+            sorted_resistances = None
+        else:
+            order = sorted(range(len(capacities)), key=lambda i: (capacities[i], resistances[i]))
+            sorted_resistances = tuple(resistances[i] for i in order)
+        key = (series, parallel, self.bucket_width, self.ir_weight,
+               tuple(capacities[i] for i in order), sorted_resistances)
+        return key, order
+
+    async def solve(self, capacities: List[int], series: int, parallel: int,
+                    resistances: Optional[List[float]] = None) -> List[Dict]:
+        """Балансировка с объединением одинаковых одновременных запросов"""
+        key, order = self.normalize(capacities, series, parallel, resistances)
+        self.metrics['requests'] += 1
+
+        if key in self._cache:
+            self._cache.move_to_end(key)
+            self.metrics['cache_hits'] += 1
+            return self._remap(self._cache[key], order)
+
+        future = self._inflight.get(key)
+        if future is not None:
+            self.metrics['deduplicated'] += 1
+            logger.info(f"Single-flight: ожидаем уже идущий расчет {series}S{parallel}P")
+        else:
+            loop = asyncio.get_running_loop()
+            sorted_capacities, sorted_resistances = key[4], key[5]
+            future = loop.run_in_executor(
+                self.executor, solve_job, list(sorted_capacities), series, parallel, self.bucket_width,
+                list(sorted_resistances) if sorted_resistances is not None else None, self.ir_weight
+            )
+            future.add_done_callback(functools.partial(self._on_done, key))
+            self._inflight[key] = future
+            self.metrics['computed'] += 1
+
+        # shield: отмена одного ожидающего не должна отменять расчет для остальных
+        groups = await asyncio.shield(future)
+        return self._remap(groups, order)
+
+    def _on_done(self, key: Tuple, future: asyncio.Future) -> None:
+        self._inflight.pop(key, None)
+        if future.cancelled() or future.exception() is not None:
+            return
+        if self.cache_size > 0:
+            self._cache[key] = future.result()
+            while len(self._cache) > self.cache_size:
+                self._cache.popitem(last=False)
+
+    @staticmethod
+    def _remap(groups: List[Dict], order: List[int]) -> List[Dict]:
+        """Перевод индексов ячеек из нормализованного порядка в порядок пользователя"""
+        return [
+            dict(group, cells=[dict(cell, index=order[cell['index']]) for cell in group['cells']])
+            for group in groups
+        ]
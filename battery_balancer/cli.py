@@ -0,0 +1,240 @@
+"""Пакетная балансировка из командной строки
+
+Читает задания в формате JSON Lines из файла или stdin, считает их
+параллельно в пуле процессов и потоково пишет результаты в JSON Lines:
+
+    python -m battery_balancer jobs.jsonl -o results.jsonl -j 4
+
+Строка задания: {"id": "pack-1", "series": 4, "parallel": 2, "voltage": 3.7,
+"capacities": [2500, 2550, ...]} (вместо series/parallel допускаются S/P).
+Необязательные поля: bucket_width - квантование емкостей (мАч),
+resistances - внутренние сопротивления аккумуляторов (мОм), ir_weight - вес
+разброса сопротивления групп.
+
+С --export csv|json|jig отчет по каждому заданию пишется потоково в файл
+<id>.<расширение> (или line-<номер строки>) в каталоге --export-dir;
+задания с повторяющимся именем файла отклоняются, а не перезаписывают отчет:
+
+    python -m battery_balancer jobs.jsonl -o results.jsonl --export jig --export-dir layouts
+"""
+import argparse
+import json
+import logging
+import math
+import os
+import re
+import sys
+import time
+from concurrent.futures import ALL_COMPLETED, FIRST_COMPLETED, ProcessPoolExecutor, wait
+from typing import Any, Dict, IO, Iterator, Optional, Tuple
+
+from battery_balancer.engine import BatteryBalancer, GroupStatistics
+from battery_balancer.engine.export import WRITERS, get_writer
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_VOLTAGE = 3.7
+
+def _finite(value, name: str) -> float:
+    """Число из задания; NaN и бесконечность (допустимые в JSON Python) отклоняются"""
+    if isinstance(value, bool):
+        raise ValueError(f"Поле {name} должно быть числом, получено {json.dumps(value)}")
+    number = float(value)
+    if not math.isfinite(number):
+        raise ValueError(f"Поле {name} должно быть конечным числом, получено {value}")
+    return number
+
+def _whole(value, name: str) -> int:
+    """Целое из задания; дробные значения не округляются молча, а отклоняются"""
+    number = _finite(value, name)
+    if not number.is_integer():
+        raise ValueError(f"Поле {name} должно быть целым числом, получено {value}")
+    return int(number)
+
+def parse_job(line: str, bucket_width: int = 0) -> Dict:
+    """Разбор строки задания в словарь параметров"""
+    raw = json.loads(line)
+    if not isinstance(raw, dict):
+        raise ValueError("Задание должно быть JSON-объектом")
+    
+    series = raw.get('series', raw.get('S'))
+    parallel = raw.get('parallel', raw.get('P'))
+    capacities = raw.get('capacities')
+    if series is None or parallel is None or capacities is None:
+        raise ValueError("Задание должно содержать series, parallel и capacities")
+    
+    return {
+        'id': raw.get('id'),
+        'series': _whole(series, 'series'),
+        'parallel': _whole(parallel, 'parallel'),
+        'voltage': _finite(raw.get('voltage', DEFAULT_VOLTAGE), 'voltage'),
+        'capacities': [_whole(cap, 'capacities') for cap in capacities],
+        'bucket_width': _whole(raw.get('bucket_width', bucket_width), 'bucket_width'),
+        'resistances': (
+            [_finite(ir, 'resistances') for ir in raw['resistances']] if raw.get('resistances') is not None else None
+        ),
+        'ir_weight': _finite(raw.get('ir_weight', 0.1), 'ir_weight')
+    }
+
+def run_job(job: Dict) -> Dict:
+    """Расчет одного задания (выполняется в процессе пула)"""
+    balancer = BatteryBalancer()
+    series, parallel, voltage = job['series'], job['parallel'], job['voltage']
+    
+    is_valid, error_msg = balancer.validate_voltage(voltage)
+    if not is_valid:
+        raise ValueError(f"Неверное напряжение: {error_msg}")
+    
+    statistics = GroupStatistics()
+    groups = balancer.balance_batteries_repackr(
+        job['capacities'], series, parallel, job['bucket_width'], job['resistances'], job['ir_weight'], statistics
+    )
+    stats = statistics.summary(series, voltage)
+    
+    result = {
+        'config': f"{series}S{parallel}P",
+        'groups': [
+            {
+                'cells': [cell['index'] for cell in group['cells']],
+                'capacities': [cell['capacity'] for cell in group['cells']],
+                'capacity': group['capacity'],
+                'ir': group.get('ir')
+            }
+            for group in groups
+        ],
+        'stats': stats
+    }
+    
+    # Отчет пишется прямо в файл, без копии в памяти
+    export = job.get('export')
+    if export:
+        with open(export['path'], 'wb') as stream:
+            get_writer(export['format']).write(stream, groups, stats, series, parallel, voltage)
+        result['export'] = export['path']
+    
+    return result
+
+def export_path(export_dir: str, format_name: str, line_no: int, job_id) -> str:
+    """Файл отчета задания: id, очищенный от символов, недопустимых в имени файла"""
+    name = re.sub(r'[^\w.-]', '_', str(job_id)) if job_id is not None else f"line-{line_no}"
+    return os.path.join(export_dir, f"{name}.{get_writer(format_name).extension}")
+
+def _job_id(line: str):
+    """id задания из строки, которую не удалось разобрать (None, если его нет)"""
+    try:
+        raw = json.loads(line)
+    except ValueError:
+        return None
+    return raw.get('id') if isinstance(raw, dict) else None
+
+def _read_jobs(stream: IO[str], bucket_width: int = 0) -> Iterator[Tuple[int, Optional[Dict], Optional[str], Any]]:
+    """Задания из потока: (номер строки, задание, ошибка разбора, id задания)"""
+    for line_no, line in enumerate(stream, 1):
+        if not line.strip():
+            continue
+        try:
+            job = parse_job(line, bucket_width)
+        except (ValueError, TypeError) as e:
+            yield line_no, None, str(e), _job_id(line)
+        else:
+            yield line_no, job, None, job['id']
+
+def process_stream(source: IO[str], output: IO[str], workers: Optional[int] = None,
+                   bucket_width: int = 0, export_format: Optional[str] = None,
+                   export_dir: str = '.') -> Dict:
+    """Параллельная обработка заданий с потоковой записью результатов
+
+    Число одновременно выполняемых заданий ограничено, поэтому большие входные
+    файлы не загружаются в память целиком. Результаты пишутся по мере готовности
+    и содержат номер строки и id задания. При export_format отчет по каждому
+    заданию пишется в export_dir; задание, чей файл отчета совпал с файлом
+    предыдущего (повторяющийся или совпавший после очистки id), не выполняется
+    и получает запись об ошибке.
+    """
+    summary = {'jobs': 0, 'ok': 0, 'failed': 0}
+    started = time.perf_counter()
+    
+    def emit(record: Dict) -> None:
+        summary['jobs'] += 1
+        summary['ok' if record['ok'] else 'failed'] += 1
+        output.write(json.dumps(record, ensure_ascii=False) + "\n")
+    
+    workers = workers or os.cpu_count() or 1
+    export_paths = {}
+    if export_format:
+        os.makedirs(export_dir, exist_ok=True)
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        window = workers * 4
+        pending = {}
+        
+        def drain(return_when) -> None:
+            done, _ = wait(pending, return_when=return_when)
+            for future in done:
+                line_no, job_id = pending.pop(future)
+                record = {'line': line_no, 'id': job_id}
+                try:
+                    record.update(ok=True, **future.result())
+                except Exception as e:
+                    record.update(ok=False, error=str(e))
+                emit(record)
+            output.flush()
+        
+        for line_no, job, error, job_id in _read_jobs(source, bucket_width):
+            if job is None:
+                emit({'line': line_no, 'id': job_id, 'ok': False, 'error': error})
+                continue
+            if export_format:
+                path = export_path(export_dir, export_format, line_no, job['id'])
+                if path in export_paths:
+                    emit({'line': line_no, 'id': job['id'], 'ok': False,
+                          'error': f"Файл отчета {path} уже занят заданием в строке {export_paths[path]}"})
+                    continue
+                export_paths[path] = line_no
+                job['export'] = {'format': export_format, 'path': path}
+            pending[executor.submit(run_job, job)] = (line_no, job['id'])
+            if len(pending) >= window:
+                drain(FIRST_COMPLETED)
+        
+        if pending:
+            drain(ALL_COMPLETED)
+    
+    elapsed = time.perf_counter() - started
+    summary['elapsed_sec'] = round(elapsed, 3)
+    summary['jobs_per_sec'] = round(summary['jobs'] / elapsed, 2) if elapsed > 0 else 0.0
+    return summary
+
+def main(argv: Optional[list] = None) -> int:
+    """Точка входа CLI"""
+    parser = argparse.ArgumentParser(
+        prog='python -m battery_balancer',
+        description="Пакетная балансировка сборок аккумуляторов (JSON Lines)"
+    )
+    parser.add_argument('input', nargs='?', default='-', help="файл заданий JSONL или '-' для stdin")
+    parser.add_argument('-o', '--output', default='-', help="файл результатов JSONL или '-' для stdout")
+    parser.add_argument('-j', '--jobs', type=int, default=None, help="число процессов (по умолчанию - число ядер)")
+    parser.add_argument('-q', '--bucket-width', type=int, default=0,
+                        help="ширина корзины квантования емкостей, мАч (по умолчанию без квантования)")
+    parser.add_argument('--export', choices=sorted(WRITERS), default=None,
+                        help="формат отчета по каждому заданию")
+    parser.add_argument('--export-dir', default='.', help="каталог для отчетов --export")
+    parser.add_argument('-v', '--verbose', action='store_true', help="подробный лог в stderr")
+    args = parser.parse_args(argv)
+    
+    logging.basicConfig(
+        format='%(asctime)s - %(name)s - %(levelname)s - %(message)s',
+        level=logging.INFO if args.verbose else logging.WARNING,
+        stream=sys.stderr
+    )
+    
+    source = sys.stdin if args.input == '-' else open(args.input, encoding='utf-8')
+    output = sys.stdout if args.output == '-' else open(args.output, 'w', encoding='utf-8')
+    try:
+        summary = process_stream(source, output, args.jobs, args.bucket_width, args.export, args.export_dir)
+    finally:
+        if source is not sys.stdin:
+            source.close()
+        if output is not sys.stdout:
+            output.close()
+    
+    print(json.dumps({'summary': summary}, ensure_ascii=False), file=sys.stderr)
+    return 0 if summary['failed'] == 0 else 1
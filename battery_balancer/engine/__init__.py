@@ -0,0 +1,11 @@
+"""Движок балансировки аккумуляторов без зависимостей от Telegram
+
+Модули: validation - проверка ввода, solvers - алгоритмы, stats - статистика,
+rendering - схема и CSV, jobs - функции для процессов пула.
+"""
+from battery_balancer.engine.balancer import BatteryBalancer
+from battery_balancer.engine.jobs import explore_job, solve_job
+from battery_balancer.engine.rendering import WIRING_DIAGRAM_HEADER, text_length
+from battery_balancer.engine.stats import GroupStatistics
+
+__all__ = ['BatteryBalancer', 'GroupStatistics', 'WIRING_DIAGRAM_HEADER', 'explore_job', 'solve_job', 'text_length']
@@ -0,0 +1,8 @@
+"""Фасад движка балансировки"""
+from battery_balancer.engine.rendering import RenderingMixin
+from battery_balancer.engine.solvers import SolverMixin
+from battery_balancer.engine.stats import StatsMixin
+from battery_balancer.engine.validation import ValidationMixin
+
+class BatteryBalancer(ValidationMixin, SolverMixin, StatsMixin, RenderingMixin):
+    """Проверка данных, балансировка, статистика и отчеты в одном объекте"""
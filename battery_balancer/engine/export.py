@@ -0,0 +1,208 @@
+"""Экспорт результата расчета: CSV, JSON и бинарная раскладка для стапеля
+
+Писатели пишут отчет построчно сразу в бинарный поток (BytesIO или файл),
+текстовые форматы кодируются по ходу записи через TextIOWrapper, поэтому
+промежуточная строка всего отчета не создается.
+"""
+import abc
+import contextlib
+import csv
+import io
+import json
+import struct
+from typing import BinaryIO, Dict, Iterator, List
+
+class ReportWriter(abc.ABC):
+    """Писатель отчета в формате format_name
+
+    Новые форматы подключаются подклассом с методом write и register_writer.
+    """
+
+    format_name = ''
+    extension = ''
+
+    @abc.abstractmethod
+    def write(self, stream: BinaryIO, groups: List[Dict], stats: Dict, series: int, parallel: int,
+              voltage: float) -> None:
+        """Запись отчета в бинарный поток stream"""
+
+WRITERS: Dict[str, ReportWriter] = {}
+
+def register_writer(writer: ReportWriter) -> ReportWriter:
+    """Регистрация писателя под его format_name"""
+    WRITERS[writer.format_name] = writer
+    return writer
+
+def get_writer(format_name: str) -> ReportWriter:
+    try:
+        return WRITERS[format_name]
+    except KeyError:
+        raise ValueError(f"Неизвестный формат экспорта: {format_name} (доступны: {', '.join(WRITERS)})")
+
+def export_report(format_name: str, groups: List[Dict], stats: Dict, series: int, parallel: int,
+                  voltage: float) -> io.BytesIO:
+    """Отчет в памяти, готовый к отправке (позиция в начале буфера)"""
+    buffer = io.BytesIO()
+    get_writer(format_name).write(buffer, groups, stats, series, parallel, voltage)
+    buffer.seek(0)
+    return buffer
+
+@contextlib.contextmanager
+def _text_stream(stream: BinaryIO, encoding: str) -> Iterator[io.TextIOWrapper]:
+    """Текстовая обертка, кодирующая запись сразу в stream
+
+    После записи обертка отсоединяется, чтобы не закрыть чужой поток.
+    """
+    text = io.TextIOWrapper(stream, encoding=encoding, newline='')
+    try:
+        yield text
+    finally:
+        text.flush()
+        text.detach()
+
+class CsvReportWriter(ReportWriter):
+    """CSV для Excel: UTF-8 с BOM, разделитель ';'"""
+
+    format_name = 'csv'
+    extension = 'csv'
+
+    def write(self, stream: BinaryIO, groups: List[Dict], stats: Dict, series: int, parallel: int,
+              voltage: float) -> None:
+        with _text_stream(stream, 'utf-8-sig') as text:
+            writer = csv.writer(text, delimiter=';')
+
+            # Основная информация
+            writer.writerow(["Конфигурация сборки аккумуляторов 18650"])
+            writer.writerow([])
+            writer.writerow(["Параметр", "Значение"])
+            writer.writerow(["Конфигурация", f"{series}S{parallel}P"])
+            writer.writerow(["Общая емкость", f"{stats['total_capacity']:.0f} мАч"])
+            writer.writerow(["Напряжение", f"{stats['total_voltage']:.2f} В"])
+            writer.writerow(["Энергия", f"{stats['total_energy']:.2f} Вт·ч"])
+            writer.writerow(["Количество аккумуляторов", f"{stats['total_cells']} шт"])
+            writer.writerow(["Средняя емкость группы", f"{stats['avg_capacity']:.0f} мАч"])
+            writer.writerow([])
+
+            # Статистика
+            writer.writerow(["Статистика балансировки"])
+            writer.writerow(["Параметр", "Значение"])
+            writer.writerow(["Максимальное отклонение", f"{stats['max_deviation']:.0f} мАч"])
+            writer.writerow(["Среднее отклонение", f"{stats['avg_deviation']:.0f} мАч"])
+            writer.writerow(["Качество балансировки", f"{stats['balance_quality']:.1f} %"])
+            writer.writerow(["Стандартное отклонение", f"{stats['std_deviation']:.1f} мАч"])
+            writer.writerow(["Размах емкостей групп", f"{stats['capacity_range']:.0f} мАч"])
+            writer.writerow(["Отклонение p50 / p95", f"{stats['deviation_p50']:.0f} / {stats['deviation_p95']:.0f} мАч"])
+            writer.writerow(["Энергия до разряда слабейшей группы", f"{stats['usable_energy']:.2f} Вт·ч"])
+            if 'ir_spread' in stats:
+                writer.writerow(["Среднее сопротивление группы", f"{stats['avg_group_ir']:.2f} мОм"])
+                writer.writerow(["Разброс сопротивления групп", f"{stats['ir_spread']:.2f} мОм"])
+            writer.writerow([])
+
+            # Устойчивость к погрешности измерений
+            robustness = stats.get('robustness')
+            if robustness:
+                writer.writerow([f"Устойчивость к погрешности измерений ±{robustness['noise'] * 100:.0f}%"])
+                writer.writerow(["Параметр", "Значение"])
+                writer.writerow(["Количество выборок", robustness['samples']])
+                writer.writerow(["Максимальное отклонение p50", f"{robustness['max_deviation_p50']:.0f} мАч"])
+                writer.writerow(["Максимальное отклонение p95", f"{robustness['max_deviation_p95']:.0f} мАч"])
+                writer.writerow(["Максимальное отклонение p99", f"{robustness['max_deviation_p99']:.0f} мАч"])
+                writer.writerow(["Качество балансировки p50", f"{robustness['balance_quality_p50']:.1f} %"])
+                writer.writerow(["Качество балансировки p5", f"{robustness['balance_quality_p5']:.1f} %"])
+                writer.writerow(["Качество балансировки p1", f"{robustness['balance_quality_p1']:.1f} %"])
+                writer.writerow([])
+
+            # Схема распайки
+            writer.writerow(["Схема распайки"])
+            has_ir = 'ir_spread' in stats
+            header = ["Группа", "Аккумуляторы (мАч)", "Суммарная емкость (мАч)", "Отклонение (мАч)", "Отклонение (%)", "Статус"]
+            if has_ir:
+                header.append("Сопротивление группы (мОм)")
+            writer.writerow(header)
+
+            deviations = zip(stats['group_deviations'], stats['group_deviation_percents'], stats['group_statuses'])
+            for i, (group, (deviation, deviation_percent, status)) in enumerate(zip(groups, deviations), 1):
+                batteries = '+'.join(str(cell['capacity']) for cell in group['cells'])
+                row = [
+                    f"Группа {i}",
+                    batteries,
+                    f"{group['capacity']:.0f}",
+                    f"{deviation:+.0f}",
+                    f"{deviation_percent:+.1f}%",
+                    status
+                ]
+                if has_ir:
+                    row.append(f"{group['ir']:.2f}")
+                writer.writerow(row)
+
+class JsonReportWriter(ReportWriter):
+    """JSON: параметры, скалярная статистика и группы с отклонениями
+
+    Группы сериализуются по одной, а не одним json.dumps всего отчета.
+    """
+
+    format_name = 'json'
+    extension = 'json'
+
+    def write(self, stream: BinaryIO, groups: List[Dict], stats: Dict, series: int, parallel: int,
+              voltage: float) -> None:
+        # Посписочные данные групп выводятся в самих группах
+        summary = {key: value for key, value in stats.items() if not isinstance(value, list)}
+        with _text_stream(stream, 'utf-8') as text:
+            text.write('{"config": ' + json.dumps(f"{series}S{parallel}P"))
+            text.write(f', "series": {series}, "parallel": {parallel}, "voltage": {json.dumps(voltage)}')
+            text.write(', "stats": ' + json.dumps(summary, ensure_ascii=False))
+            text.write(', "groups": [')
+            for i, group in enumerate(groups):
+                record = {
+                    'group': i + 1,
+                    'cells': [cell['index'] for cell in group['cells']],
+                    'capacities': [cell['capacity'] for cell in group['cells']],
+                    'capacity': group['capacity'],
+                    'deviation': stats['group_deviations'][i],
+                    'deviation_percent': stats['group_deviation_percents'][i],
+                    'status': stats['group_statuses'][i]
+                }
+                if 'ir' in group:
+                    record['ir'] = group['ir']
+                text.write((', ' if i else '') + json.dumps(record, ensure_ascii=False))
+            text.write(']}\n')
+
+class JigLayoutWriter(ReportWriter):
+    """Бинарная раскладка для ПО сборочного стапеля (little-endian)
+
+    Заголовок: магия b'BBJ1', версия (B), флаги (B, бит 0 - есть сопротивления),
+    S (H), P (H), напряжение аккумулятора (f).
+    Далее S групп: число аккумуляторов (H), емкость группы в мАч (I), затем
+    для каждого аккумулятора номер во входном списке с нуля (H) и емкость в мАч (H),
+    при флаге сопротивления - еще сопротивление в десятых долях мОм (H).
+    """
+
+    format_name = 'jig'
+    extension = 'bbj'
+
+    MAGIC = b'BBJ1'
+    VERSION = 1
+    FLAG_IR = 0x01
+    HEADER = struct.Struct('<4sBBHHf')
+    GROUP = struct.Struct('<HI')
+    CELL = struct.Struct('<HH')
+    CELL_IR = struct.Struct('<HHH')
+
+    def write(self, stream: BinaryIO, groups: List[Dict], stats: Dict, series: int, parallel: int,
+              voltage: float) -> None:
+        has_ir = all('ir' in cell for group in groups for cell in group['cells'])
+        stream.write(self.HEADER.pack(self.MAGIC, self.VERSION, self.FLAG_IR if has_ir else 0,
+                                      series, parallel, voltage))
+        for group in groups:
+            stream.write(self.GROUP.pack(len(group['cells']), round(group['capacity'])))
+            for cell in group['cells']:
+                if cell.get('index') is None:
+                    raise ValueError("Для раскладки стапеля нужны номера аккумуляторов")
+                if has_ir:
+                    stream.write(self.CELL_IR.pack(cell['index'], cell['capacity'], round(cell['ir'] * 10)))
+                else:
+                    stream.write(self.CELL.pack(cell['index'], cell['capacity']))
+
+for _writer in (CsvReportWriter(), JsonReportWriter(), JigLayoutWriter()):
+    register_writer(_writer)
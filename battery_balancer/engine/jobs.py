@@ -0,0 +1,24 @@
+"""Точки входа для процессов пула: принимают и возвращают только простые данные"""
+from typing import Dict, List, Optional
+
+from battery_balancer.engine.balancer import BatteryBalancer
+from battery_balancer.engine.stats import GroupStatistics
+
+def solve_job(capacities: List[int], series: int, parallel: int, bucket_width: int = 0,
+              resistances: Optional[List[float]] = None, ir_weight: float = 0.1) -> List[Dict]:
+    """Расчет балансировки (точка входа для процессов пула)"""
+    return BatteryBalancer().balance_batteries_repackr(
+        capacities, series, parallel, bucket_width, resistances, ir_weight
+    )
+
+def explore_job(capacities: List[int], series: int, parallel: int, voltage: float) -> Dict:
+    """Расчет одной конфигурации для режима подбора (точка входа для процессов пула)"""
+    statistics = GroupStatistics()
+    BatteryBalancer().balance_batteries_repackr(capacities, series, parallel, statistics=statistics)
+    stats = statistics.summary(series, voltage)
+    return {
+        'total_capacity': stats['total_capacity'],
+        'total_energy': stats['total_energy'],
+        'max_deviation': stats['max_deviation'],
+        'balance_quality': stats['balance_quality']
+    }
@@ -0,0 +1,90 @@
+"""Текстовая схема распайки и экспорт отчетов"""
+import io
+import logging
+from typing import Dict, Iterator, List, Optional
+
+from battery_balancer.engine.export import export_report
+
+logger = logging.getLogger(__name__)
+
+WIRING_DIAGRAM_HEADER = "🔋 СХЕМА РАСПАЙКИ 🔋\n\n"
+
+# Значки статусов групп для схемы распайки (статусы считает GroupStatistics)
+STATUS_ICONS = {"Идеально": "💚", "Хорошо": "💙", "Средне": "💛", "Плохо": "❤️"}
+
+def text_length(text: str) -> int:
+    """Длина текста в UTF-16 единицах (так считает лимиты Telegram)"""
+    return len(text.encode('utf-16-le')) // 2
+
+class RenderingMixin:
+    """Схема распайки и отчеты для скачивания"""
+
+    def _format_group_block(self, number: int, group: Dict, stats: Dict) -> str:
+        """Текстовый блок одной группы для схемы распайки"""
+        # Отклонение и статус группы уже посчитаны в статистике
+        deviation = stats['group_deviations'][number - 1]
+        deviation_percent = stats['group_deviation_percents'][number - 1]
+        status = stats['group_statuses'][number - 1]
+        status = f"{STATUS_ICONS[status]} {status}"
+        
+        capacities_str = ' + '.join(str(cell['capacity']) for cell in group['cells'])
+        block = (
+            f"🏷️ Группа {number}:\n"
+            f"🔋 Аккумуляторы: {capacities_str}\n"
+            f"📊 Суммарно: {group['capacity']:.0f} мАч\n"
+            f"⚖️ Отклонение: {deviation:+.0f} мАч ({deviation_percent:+.1f}%)\n"
+        )
+        if 'ir' in group:
+            block += f"🔌 Сопротивление группы: {group['ir']:.2f} мОм\n"
+        return block + f"📈 {status}\n\n"
+
+    def create_wiring_diagram(self, groups: List[Dict], stats: Dict) -> str:
+        """Создание текстовой схемы распайки"""
+        blocks = [WIRING_DIAGRAM_HEADER]
+        blocks.extend(self._format_group_block(i, group, stats) for i, group in enumerate(groups, 1))
+        return ''.join(blocks)
+
+    def iter_wiring_pages(self, groups: List[Dict], stats: Dict, page_limit: int,
+                          first_page_limit: Optional[int] = None) -> Iterator[str]:
+        """Постраничная схема распайки за один проход
+
+        Страницы собираются из целых блоков групп и отдаются по мере готовности,
+        длина считается в UTF-16 единицах, как ее считает Telegram.
+        """
+        parts = [WIRING_DIAGRAM_HEADER]
+        size = text_length(WIRING_DIAGRAM_HEADER)
+        groups_on_page = 0
+        limit = first_page_limit if first_page_limit is not None else page_limit
+        
+        for i, group in enumerate(groups, 1):
+            block = self._format_group_block(i, group, stats)
+            block_size = text_length(block)
+            if groups_on_page and size + block_size > limit:
+                yield ''.join(parts)
+                parts = []
+                size = 0
+                groups_on_page = 0
+                limit = page_limit
+            parts.append(block)
+            size += block_size
+            groups_on_page += 1
+        
+        yield ''.join(parts)
+
+    def export_report(self, format_name: str, groups: List[Dict], stats: Dict, series: int, parallel: int,
+                      voltage: float) -> io.BytesIO:
+        """Отчет в формате format_name (csv, json, jig) в буфере, готовом к отправке"""
+        return export_report(format_name, groups, stats, series, parallel, voltage)
+
+    def create_csv_file(self, groups: List[Dict], stats: Dict, series: int, parallel: int, voltage: float) -> io.BytesIO:
+        """Создание CSV файла с результатами и обработкой исключений"""
+        try:
+            return export_report('csv', groups, stats, series, parallel, voltage)
+        except Exception as e:
+            logger.error(f"CSV creation error: {e}")
+            # Возвращаем файл с сообщением об ошибке
+            error_content = f"Ошибка при создании CSV файла: {str(e)}"
+            csv_bytes = io.BytesIO()
+            csv_bytes.write(error_content.encode('utf-8'))
+            csv_bytes.seek(0)
+            return csv_bytes
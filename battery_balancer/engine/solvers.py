@@ -0,0 +1,396 @@
+"""Алгоритмы балансировки и подбора конфигураций"""
+import functools
+import logging
+from collections import Counter
+from typing import Dict, List, Optional, Tuple
+
+from battery_balancer.engine.stats import GroupStatistics
+
+logger = logging.getLogger(__name__)
+
+class SolverMixin:
+    """Алгоритмы балансировки групп и перебор конфигураций"""
+
+    # Проходы доводки реальными аккумуляторами после квантованного поиска
+    QUANTIZED_REFINE_ROUNDS = 3
+
+    @staticmethod
+    def quantize_capacity(capacity: int, bucket_width: int) -> int:
+        """Округление емкости до центра корзины шириной bucket_width мАч"""
+        return (capacity + bucket_width // 2) // bucket_width * bucket_width
+
+    def balance_batteries_repackr(self, capacities: List[int], series: int, parallel: int,
+                                  bucket_width: int = 0, resistances: Optional[List[float]] = None,
+                                  ir_weight: float = 0.1,
+                                  statistics: Optional[GroupStatistics] = None) -> List[Dict]:
+        """Улучшенный алгоритм балансировки по принципу repackr
+        
+        При bucket_width > 0 емкости в пределах погрешности измерения квантуются,
+        перестановки ищутся по мультимножествам (значение, количество), а в конце
+        квантованные значения заменяются реальными аккумуляторами и раскладка
+        доводится несколькими проходами перестановок по реальным емкостям.
+        
+        Если заданы resistances (мОм), группы балансируются по взвешенной цели:
+        относительное отклонение емкости плюс ir_weight * относительное отклонение
+        проводимости группы (обратной величины ее эквивалентного сопротивления).
+        
+        Если передан statistics, итоговые группы учитываются в нем по мере
+        формирования, и статистику не нужно считать отдельным проходом.
+        """
+        try:
+            # Проверка на None значения
+            if capacities is None or series is None or parallel is None:
+                raise ValueError("Не все параметры заданы")
+            
+            if bucket_width < 0:
+                raise ValueError("Ширина корзины квантования не может быть отрицательной")
+            
+            # Валидация входных данных
+            is_valid, error_msg = self.validate_capacities(capacities)
+            if not is_valid:
+                raise ValueError(f"Неверные данные емкостей: {error_msg}")
+            
+            is_valid, error_msg = self.validate_configuration(series, parallel)
+            if not is_valid:
+                raise ValueError(f"Неверная конфигурация: {error_msg}")
+            
+            total_cells = len(capacities)
+            cells_per_group = parallel
+            
+            if total_cells != series * parallel:
+                raise ValueError(f"Количество аккумуляторов ({total_cells}) не соответствует конфигурации {series}S{parallel}P")
+            
+            if resistances is not None:
+                is_valid, error_msg = self.validate_resistances(resistances, total_cells)
+                if not is_valid:
+                    raise ValueError(f"Неверные данные сопротивлений: {error_msg}")
+                if bucket_width:
+                    # Равные по емкости аккумуляторы с разным сопротивлением не взаимозаменяемы
+                    logger.info("Квантование емкостей отключено: заданы внутренние сопротивления")
+                    bucket_width = 0
+            
+            # Создаем массив объектов с емкостями
+            if bucket_width:
+                cells = [{'capacity': self.quantize_capacity(cap, bucket_width), 'index': i}
+                         for i, cap in enumerate(capacities)]
+            elif resistances is not None:
+                cells = [{'capacity': cap, 'index': i, 'ir': ir}
+                         for i, (cap, ir) in enumerate(zip(capacities, resistances))]
+            else:
+                cells = [{'capacity': cap, 'index': i} for i, cap in enumerate(capacities)]
+            
+            # Сортируем по убыванию емкости
+            cells.sort(key=lambda x: x['capacity'], reverse=True)
+            
+            # Рассчитываем целевую емкость
+            total_capacity = sum(cell['capacity'] for cell in cells)
+            target_capacity = total_capacity / series
+            
+            # Суммарная проводимость не меняется при перестановках, поэтому цель постоянна
+            if resistances is not None:
+                target_conductance = sum(1 / ir for ir in resistances) / series
+                group_cost = functools.partial(
+                    self._weighted_group_cost,
+                    target_capacity=target_capacity,
+                    target_conductance=target_conductance,
+                    ir_weight=ir_weight
+                )
+            
+            best_solution = None
+            best_score = float('inf')
+            
+            # Пробуем несколько стратегий
+            for attempt in range(3):
+                test_groups = [{'cells': [], 'capacity': 0} for _ in range(series)]
+                available_cells = cells.copy()
+                
+                if attempt == 0:
+                    # Стратегия 1: Равномерное распределение
+                    for i, cell in enumerate(available_cells):
+                        group_idx = i % series
+                        if len(test_groups[group_idx]['cells']) < cells_per_group:
+                            test_groups[group_idx]['cells'].append(cell)
+                            test_groups[group_idx]['capacity'] += cell['capacity']
+                elif attempt == 1:
+                    # Стратегия 2: Жадный алгоритм
+                    available_cells.sort(key=lambda x: x['capacity'], reverse=True)
+                    for cell in available_cells:
+                        best_group_idx = -1
+                        best_diff = float('inf')
+                        
+                        for j, group in enumerate(test_groups):
+                            if len(group['cells']) < cells_per_group:
+                                new_capacity = group['capacity'] + cell['capacity']
+                                diff = abs(new_capacity - target_capacity)
+                                if diff < best_diff:
+                                    best_diff = diff
+                                    best_group_idx = j
+                        
+                        if best_group_idx != -1:
+                            test_groups[best_group_idx]['cells'].append(cell)
+                            test_groups[best_group_idx]['capacity'] += cell['capacity']
+                else:
+                    # Стратегия 3: Парное распределение
+                    available_cells.sort(key=lambda x: x['capacity'], reverse=True)
+                    mid_point = len(available_cells) // 2
+                    large_cells = available_cells[:mid_point]
+                    small_cells = available_cells[mid_point:]
+                    
+                    # Распределяем большие аккумуляторы
+                    for i, cell in enumerate(large_cells):
+                        group_idx = i % series
+                        if len(test_groups[group_idx]['cells']) < cells_per_group:
+                            test_groups[group_idx]['cells'].append(cell)
+                            test_groups[group_idx]['capacity'] += cell['capacity']
+                    
+                    # Распределяем маленькие в обратном порядке
+                    for i, cell in enumerate(small_cells):
+                        group_idx = (series - 1 - (i % series))
+                        if len(test_groups[group_idx]['cells']) < cells_per_group:
+                            test_groups[group_idx]['cells'].append(cell)
+                            test_groups[group_idx]['capacity'] += cell['capacity']
+                
+                # Оптимизация перестановками
+                if bucket_width:
+                    # По мультимножествам: перестановки равных значений пропускаются
+                    self._optimize_swaps_multiset(test_groups, target_capacity)
+                elif resistances is not None:
+                    self._optimize_swaps_weighted(test_groups, target_capacity, target_conductance, ir_weight)
+                else:
+                    self._optimize_swaps(test_groups, target_capacity)
+                
+                # Оценка качества
+                if resistances is not None:
+                    deviations = [group_cost(group['capacity'], self._group_conductance(group)) for group in test_groups]
+                else:
+                    deviations = [abs(group['capacity'] - target_capacity) for group in test_groups]
+                max_deviation = max(deviations)
+                avg_deviation = sum(deviations) / series
+                score = max_deviation * 0.6 + avg_deviation * 0.4
+                
+                if score < best_score:
+                    best_score = score
+                    best_solution = [group.copy() for group in test_groups]
+            
+            best_solution = best_solution or test_groups
+            if bucket_width:
+                best_solution = self._expand_quantized(best_solution, capacities, bucket_width)
+                # Доводка по реальным емкостям: ошибка квантования внутри корзин
+                # остается после раскладки, несколько проходов ее убирают
+                self._optimize_swaps(best_solution, sum(capacities) / series, self.QUANTIZED_REFINE_ROUNDS)
+            for group in best_solution:
+                if resistances is not None:
+                    group['ir'] = 1 / self._group_conductance(group)
+                if statistics is not None:
+                    statistics.add(group)
+            
+            logger.info(f"Балансировка завершена: {series}S{parallel}P, {len(capacities)} аккумуляторов")
+            return best_solution
+            
+        except Exception as e:
+            logger.error(f"Ошибка в balance_batteries_repackr: {e}")
+            raise
+
+    @staticmethod
+    def _optimize_swaps(groups: List[Dict], target_capacity: float, max_rounds: int = 10) -> None:
+        """Оптимизация перестановками аккумуляторов между группами по емкости"""
+        for optimization_round in range(max_rounds):
+            improved = False
+            for i in range(len(groups)):
+                for j in range(i + 1, len(groups)):
+                    for k in range(len(groups[i]['cells'])):
+                        for l in range(len(groups[j]['cells'])):
+                            cell_a = groups[i]['cells'][k]
+                            cell_b = groups[j]['cells'][l]
+                            
+                            current_dev = (abs(groups[i]['capacity'] - target_capacity) + 
+                                           abs(groups[j]['capacity'] - target_capacity))
+                            
+                            new_cap_i = groups[i]['capacity'] - cell_a['capacity'] + cell_b['capacity']
+                            new_cap_j = groups[j]['capacity'] - cell_b['capacity'] + cell_a['capacity']
+                            new_dev = abs(new_cap_i - target_capacity) + abs(new_cap_j - target_capacity)
+                            
+                            if new_dev < current_dev:
+                                groups[i]['cells'][k] = cell_b
+                                groups[j]['cells'][l] = cell_a
+                                groups[i]['capacity'] = new_cap_i
+                                groups[j]['capacity'] = new_cap_j
+                                improved = True
+            
+            if not improved:
+                break
+
+    @staticmethod
+    def _group_conductance(group: Dict) -> float:
+        """Проводимость параллельной группы (1/мОм)"""
+        return sum(1 / cell['ir'] for cell in group['cells'])
+
+    @staticmethod
+    def _weighted_group_cost(capacity: float, conductance: float, target_capacity: float,
+                             target_conductance: float, ir_weight: float) -> float:
+        """Взвешенное отклонение группы по емкости и проводимости"""
+        return (abs(capacity - target_capacity) / target_capacity
+                + ir_weight * abs(conductance - target_conductance) / target_conductance)
+
+    def _optimize_swaps_weighted(self, groups: List[Dict], target_capacity: float, target_conductance: float,
+                                 ir_weight: float) -> None:
+        """Оптимизация перестановками по емкости и внутреннему сопротивлению
+        
+        Проводимости аккумуляторов (1/ir) считаются один раз и переставляются
+        вместе с аккумуляторами, емкость и проводимость групп обновляются
+        инкрементально, а стоимость пары групп пересчитывается только после
+        перестановки. Стоимость считается той же арифметикой, что и
+        _weighted_group_cost, встроенной в цикл, как в режиме только по емкости.
+        """
+        cells = [group['cells'] for group in groups]
+        caps = [[cell['capacity'] for cell in group_cells] for group_cells in cells]
+        conds = [[1 / cell['ir'] for cell in group_cells] for group_cells in cells]
+        group_caps = [group['capacity'] for group in groups]
+        group_conds = [self._group_conductance(group) for group in groups]
+        costs = [abs(cap - target_capacity) / target_capacity
+                 + ir_weight * abs(cond - target_conductance) / target_conductance
+                 for cap, cond in zip(group_caps, group_conds)]
+        
+        for optimization_round in range(10):
+            improved = False
+            for i in range(len(groups)):
+                cells_i, caps_i, conds_i = cells[i], caps[i], conds[i]
+                for j in range(i + 1, len(groups)):
+                    cells_j, caps_j, conds_j = cells[j], caps[j], conds[j]
+                    cap_i, cap_j = group_caps[i], group_caps[j]
+                    cond_i, cond_j = group_conds[i], group_conds[j]
+                    current_cost = costs[i] + costs[j]
+                    for k in range(len(caps_i)):
+                        for l in range(len(caps_j)):
+                            capacity_delta = caps_j[l] - caps_i[k]
+                            conductance_delta = conds_j[l] - conds_i[k]
+                            new_cap_i = cap_i + capacity_delta
+                            new_cap_j = cap_j - capacity_delta
+                            new_cond_i = cond_i + conductance_delta
+                            new_cond_j = cond_j - conductance_delta
+                            new_cost_i = (abs(new_cap_i - target_capacity) / target_capacity
+                                          + ir_weight * abs(new_cond_i - target_conductance) / target_conductance)
+                            new_cost_j = (abs(new_cap_j - target_capacity) / target_capacity
+                                          + ir_weight * abs(new_cond_j - target_conductance) / target_conductance)
+                            
+                            if new_cost_i + new_cost_j < current_cost:
+                                cells_i[k], cells_j[l] = cells_j[l], cells_i[k]
+                                caps_i[k], caps_j[l] = caps_j[l], caps_i[k]
+                                conds_i[k], conds_j[l] = conds_j[l], conds_i[k]
+                                cap_i, cap_j = new_cap_i, new_cap_j
+                                cond_i, cond_j = new_cond_i, new_cond_j
+                                costs[i], costs[j] = new_cost_i, new_cost_j
+                                current_cost = new_cost_i + new_cost_j
+                                improved = True
+                    group_caps[i], group_caps[j] = cap_i, cap_j
+                    group_conds[i], group_conds[j] = cond_i, cond_j
+            
+            if not improved:
+                break
+        
+        for group, cap in zip(groups, group_caps):
+            group['capacity'] = cap
+
+    def _optimize_swaps_multiset(self, groups: List[Dict], target_capacity: float) -> None:
+        """Оптимизация перестановками по счетчикам квантованных значений"""
+        counts = [Counter(cell['capacity'] for cell in group['cells']) for group in groups]
+        group_caps = [group['capacity'] for group in groups]
+        
+        for optimization_round in range(10):
+            improved = False
+            for i in range(len(groups)):
+                for j in range(i + 1, len(groups)):
+                    for value_a in sorted(counts[i]):
+                        for value_b in sorted(counts[j]):
+                            if value_a == value_b or not counts[i][value_a] or not counts[j][value_b]:
+                                continue
+                            
+                            current_dev = abs(group_caps[i] - target_capacity) + abs(group_caps[j] - target_capacity)
+                            new_cap_i = group_caps[i] - value_a + value_b
+                            new_cap_j = group_caps[j] - value_b + value_a
+                            new_dev = abs(new_cap_i - target_capacity) + abs(new_cap_j - target_capacity)
+                            
+                            if new_dev < current_dev:
+                                counts[i][value_a] -= 1
+                                counts[i][value_b] += 1
+                                counts[j][value_b] -= 1
+                                counts[j][value_a] += 1
+                                group_caps[i] = new_cap_i
+                                group_caps[j] = new_cap_j
+                                improved = True
+            
+            if not improved:
+                break
+        
+        for group, group_counts, group_cap in zip(groups, counts, group_caps):
+            group['cells'] = [{'capacity': value, 'index': None}
+                              for value in sorted(group_counts.elements(), reverse=True)]
+            group['capacity'] = group_cap
+
+    def _expand_quantized(self, groups: List[Dict], capacities: List[int], bucket_width: int) -> List[Dict]:
+        """Замена квантованных значений реальными аккумуляторами
+        
+        Внутри каждой корзины самые емкие аккумуляторы достаются группам
+        с наименьшей прогнозной емкостью, что компенсирует ошибку квантования.
+        """
+        buckets: Dict[int, List[Tuple[int, int]]] = {}
+        for i, cap in enumerate(capacities):
+            buckets.setdefault(self.quantize_capacity(cap, bucket_width), []).append((cap, i))
+        
+        demand: Dict[int, Counter] = {}
+        for group_idx, group in enumerate(groups):
+            for cell in group['cells']:
+                demand.setdefault(cell['capacity'], Counter())[group_idx] += 1
+        
+        # Прогноз: реальная емкость размещенных + квантованная емкость остальных
+        projected = [group['capacity'] for group in groups]
+        result = [{'cells': [], 'capacity': 0} for _ in groups]
+        
+        for value in sorted(buckets, reverse=True):
+            need = demand[value]
+            for cap, index in sorted(buckets[value], reverse=True):
+                group_idx = min((g for g in need if need[g] > 0), key=lambda g: projected[g])
+                need[group_idx] -= 1
+                projected[group_idx] += cap - value
+                result[group_idx]['cells'].append({'capacity': cap, 'index': index})
+                result[group_idx]['capacity'] += cap
+        
+        return result
+
+    def enumerate_layouts(self, capacities: List[int], voltage: float, min_voltage: Optional[float] = None,
+                          max_voltage: Optional[float] = None) -> List[Dict]:
+        """Все допустимые конфигурации S x P для набора аккумуляторов
+        
+        Допускается остаток: если S x P меньше числа аккумуляторов, в сборку идут
+        самые емкие. Для каждой конфигурации энергия известна до расчета, она же
+        служит верхней оценкой итогового балла (энергия x качество балансировки).
+        Результат отсортирован по убыванию этой оценки.
+        """
+        ordered = sorted(capacities, reverse=True)
+        prefix_sums = [0]
+        for cap in ordered:
+            prefix_sums.append(prefix_sums[-1] + cap)
+        
+        layouts = []
+        for series in range(1, len(ordered) + 1):
+            pack_voltage = series * voltage
+            if min_voltage is not None and pack_voltage < min_voltage:
+                continue
+            if max_voltage is not None and pack_voltage > max_voltage:
+                break
+            for parallel in range(1, len(ordered) // series + 1):
+                is_valid, _ = self.validate_configuration(series, parallel)
+                if not is_valid:
+                    continue
+                used_cells = series * parallel
+                layouts.append({
+                    'series': series,
+                    'parallel': parallel,
+                    'leftover': len(ordered) - used_cells,
+                    'pack_voltage': pack_voltage,
+                    'energy': prefix_sums[used_cells] * voltage / 1000,
+                    'capacities': ordered[:used_cells]
+                })
+        
+        layouts.sort(key=lambda layout: layout['energy'], reverse=True)
+        return layouts
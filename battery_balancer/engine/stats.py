@@ -0,0 +1,169 @@
+"""Статистика сборки и анализ устойчивости"""
+import math
+from typing import Dict, Iterable, List, Optional
+
+# Пороги статуса группы по модулю отклонения от средней емкости (мАч)
+BALANCE_STATUS_THRESHOLDS = ((5, "Идеально"), (20, "Хорошо"), (50, "Средне"))
+BALANCE_STATUS_WORST = "Плохо"
+
+def balance_status(abs_deviation: float) -> str:
+    """Статус балансировки группы по модулю отклонения"""
+    for threshold, status in BALANCE_STATUS_THRESHOLDS:
+        if abs_deviation <= threshold:
+            return status
+    return BALANCE_STATUS_WORST
+
+def _percentile(sorted_values: List[float], percent: float) -> float:
+    """Перцентиль с линейной интерполяцией (как numpy.percentile по умолчанию)"""
+    position = (len(sorted_values) - 1) * percent / 100
+    lower = int(position)
+    upper = min(lower + 1, len(sorted_values) - 1)
+    return sorted_values[lower] + (sorted_values[upper] - sorted_values[lower]) * (position - lower)
+
+class GroupStatistics:
+    """Накопитель статистики групп за один проход
+    
+    Решатель добавляет группы по мере формирования итогового решения (add),
+    сумма, минимум, максимум и дисперсия (алгоритм Уэлфорда) обновляются сразу.
+    summary() за O(S) дополняет их отклонениями и статусами каждой группы,
+    которые затем читают схема распайки и CSV-отчет.
+    """
+
+    def __init__(self):
+        self.group_capacities: List[float] = []
+        self.group_resistances: List[float] = []
+        self.total_cells = 0
+        self.capacity_sum = 0
+        self.min_capacity = math.inf
+        self.max_capacity = -math.inf
+        self._mean = 0.0
+        self._m2 = 0.0
+        self._has_ir = True
+
+    @classmethod
+    def from_groups(cls, groups: Iterable[Dict]) -> 'GroupStatistics':
+        accumulator = cls()
+        for group in groups:
+            accumulator.add(group)
+        return accumulator
+
+    def add(self, group: Dict) -> None:
+        """Учет одной группы"""
+        capacity = group['capacity']
+        self.group_capacities.append(capacity)
+        self.total_cells += len(group['cells'])
+        self.capacity_sum += capacity
+        self.min_capacity = min(self.min_capacity, capacity)
+        self.max_capacity = max(self.max_capacity, capacity)
+        
+        delta = capacity - self._mean
+        self._mean += delta / len(self.group_capacities)
+        self._m2 += delta * (capacity - self._mean)
+        
+        if 'ir' in group:
+            self.group_resistances.append(group['ir'])
+        else:
+            self._has_ir = False
+
+    def summary(self, series: int, voltage: float) -> Dict:
+        """Статистика сборки по накопленным группам"""
+        if not self.group_capacities:
+            raise ValueError("Нет групп для расчета статистики")
+        
+        total_capacity = self.capacity_sum / series
+        total_voltage = voltage * series
+        
+        # Отклонения и статусы групп - единственный проход по группам после накопления
+        group_deviations = []
+        group_deviation_percents = []
+        group_statuses = []
+        abs_deviations = []
+        for capacity in self.group_capacities:
+            deviation = capacity - total_capacity
+            group_deviations.append(deviation)
+            group_deviation_percents.append(deviation / total_capacity * 100 if total_capacity > 0 else 0)
+            group_statuses.append(balance_status(abs(deviation)))
+            abs_deviations.append(abs(deviation))
+        
+        max_deviation = max(abs_deviations)
+        avg_deviation = sum(abs_deviations) / len(abs_deviations)
+        balance_score = max(0, 100 - (max_deviation / total_capacity * 100)) if total_capacity > 0 else 0
+        abs_deviations.sort()
+        
+        stats = {
+            'total_capacity': total_capacity,
+            'total_voltage': total_voltage,
+            'total_energy': (total_capacity * total_voltage) / 1000,
+            'total_cells': self.total_cells,
+            'avg_capacity': total_capacity,
+            'max_deviation': max_deviation,
+            'avg_deviation': avg_deviation,
+            'balance_quality': balance_score,
+            'group_capacities': self.group_capacities,
+            'std_deviation': math.sqrt(self._m2 / len(self.group_capacities)),
+            'capacity_range': self.max_capacity - self.min_capacity,
+            'min_group_capacity': self.min_capacity,
+            'max_group_capacity': self.max_capacity,
+            'deviation_p50': _percentile(abs_deviations, 50),
+            'deviation_p95': _percentile(abs_deviations, 95),
+            # Разряд сборки заканчивается на самой слабой группе
+            'usable_energy': self.min_capacity * total_voltage / 1000,
+            'group_deviations': group_deviations,
+            'group_deviation_percents': group_deviation_percents,
+            'group_statuses': group_statuses
+        }
+        
+        # Внутреннее сопротивление групп, если оно задано
+        if self._has_ir:
+            stats['group_resistances'] = self.group_resistances
+            stats['avg_group_ir'] = sum(self.group_resistances) / len(self.group_resistances)
+            stats['ir_spread'] = max(self.group_resistances) - min(self.group_resistances)
+        
+        return stats
+
+class StatsMixin:
+    """Статистика сборки и анализ устойчивости раскладки"""
+
+    def calculate_statistics(self, groups: List[Dict], series: int, voltage: float) -> Dict:
+        """Расчет статистики сборки за один проход по группам"""
+        return GroupStatistics.from_groups(groups).summary(series, voltage)
+
+    def analyze_robustness(self, groups: List[Dict], noise: float = 0.04, samples: int = 2000,
+                           seed: Optional[int] = 0) -> Dict:
+        """Монте-Карло анализ устойчивости раскладки к погрешности измерения емкостей
+        
+        Все возмущения считаются одним пакетом NumPy: матрица (samples x cells)
+        с равномерным шумом +-noise, суммы по группам через reduceat.
+        """
+        import numpy as np
+        
+        if not (0 <= noise < 1):
+            raise ValueError("Погрешность измерения должна быть в диапазоне 0-100%")
+        if samples <= 0:
+            raise ValueError("Количество выборок должно быть положительным")
+        
+        measured = np.array([cell['capacity'] for group in groups for cell in group['cells']], dtype=np.float64)
+        group_sizes = [len(group['cells']) for group in groups]
+        offsets = np.cumsum([0] + group_sizes[:-1])
+        
+        rng = np.random.default_rng(seed)
+        perturbed = measured * rng.uniform(1 - noise, 1 + noise, size=(samples, measured.size))
+        group_caps = np.add.reduceat(perturbed, offsets, axis=1)
+        
+        avg_caps = group_caps.mean(axis=1)
+        max_deviations = np.abs(group_caps - avg_caps[:, None]).max(axis=1)
+        quality = np.maximum(0, 100 - max_deviations / avg_caps * 100)
+        
+        deviation_p50, deviation_p95, deviation_p99 = np.percentile(max_deviations, [50, 95, 99])
+        quality_p1, quality_p5, quality_p50 = np.percentile(quality, [1, 5, 50])
+        
+        return {
+            'samples': samples,
+            'noise': noise,
+            'max_deviation_p50': float(deviation_p50),
+            'max_deviation_p95': float(deviation_p95),
+            'max_deviation_p99': float(deviation_p99),
+            'balance_quality_p50': float(quality_p50),
+            'balance_quality_p5': float(quality_p5),
+            'balance_quality_p1': float(quality_p1)
+        }
@@ -0,0 +1,91 @@
+"""Проверка и разбор входных данных"""
+import math
+from typing import List, Optional, Tuple
+
+class ValidationMixin:
+    """Проверка и разбор входных данных пользователя"""
+
+    def validate_capacities(self, capacities: List[int]) -> Tuple[bool, str]:
+        """Проверка корректности емкостей"""
+        if not capacities or len(capacities) == 0:
+            return False, "Не введено ни одной емкости"
+        
+        if any(cap <= 0 for cap in capacities):
+            return False, "Емкости должны быть положительными числами"
+        
+        if any(cap < 500 for cap in capacities):
+            return False, "Емкости менее 500 мАч не реалистичны для 18650"
+        
+        if any(cap > 10000 for cap in capacities):
+            return False, "Емкости более 10000 мАч не реалистичны для 18650"
+        
+        min_cap = min(capacities)
+        max_cap = max(capacities)
+        if max_cap / min_cap > 10:
+            return False, "Слишком большой разброс емкостей (более 10 раз)"
+        
+        return True, "OK"
+    
+    def validate_configuration(self, series: int, parallel: int) -> Tuple[bool, str]:
+        """Проверка корректности конфигурации"""
+        if series is None or parallel is None:
+            return False, "Не задана конфигурация S и P"
+        
+        if not (1 <= series <= 50):
+            return False, "Количество последовательных групп (S) должно быть от 1 до 50"
+        
+        if not (1 <= parallel <= 50):
+            return False, "Количество параллельных аккумуляторов (P) должно быть от 1 до 50"
+        
+        total_cells = series * parallel
+        if total_cells > 200:
+            return False, "Слишком большая сборка (максимум 200 аккумуляторов)"
+        
+        return True, "OK"
+    
+    def validate_voltage(self, voltage: float) -> Tuple[bool, str]:
+        """Проверка корректности напряжения"""
+        if not (2.5 <= voltage <= 4.5):
+            return False, "Напряжение должно быть в диапазоне 2.5-4.5 В"
+        
+        return True, "OK"
+
+    def validate_resistances(self, resistances: List[float], count: int) -> Tuple[bool, str]:
+        """Проверка корректности внутренних сопротивлений (мОм)"""
+        if len(resistances) != count:
+            return False, "Количество сопротивлений не совпадает с количеством емкостей"
+        
+        # NaN не проходит ни одно сравнение ниже, поэтому проверяется отдельно
+        if not all(math.isfinite(ir) for ir in resistances):
+            return False, "Сопротивление должно быть конечным числом"
+        
+        if any(ir <= 0 for ir in resistances):
+            return False, "Внутреннее сопротивление должно быть положительным"
+        
+        if any(ir > 1000 for ir in resistances):
+            return False, "Сопротивление более 1000 мОм не реалистично для 18650"
+        
+        return True, "OK"
+
+    def parse_cell_records(self, text: str) -> Tuple[List[int], Optional[List[float]]]:
+        """Разбор ввода аккумуляторов: "2500 2550" или с сопротивлением "2500/45 2550/38"
+        
+        Возвращает емкости и сопротивления (None, если сопротивления не указаны).
+        """
+        text_clean = text.replace(',', ' ').replace(';', ' ')
+        capacities = []
+        resistances = []
+        
+        for token in text_clean.split():
+            capacity, _, ir = token.partition('/')
+            if not capacity.isdigit():
+                continue
+            capacities.append(int(capacity))
+            if ir:
+                resistances.append(float(ir))
+        
+        if not resistances:
+            return capacities, None
+        if len(resistances) != len(capacities):
+            raise ValueError("Укажите сопротивление для всех аккумуляторов или ни для одного")
+        return capacities, resistances
@@ -0,0 +1,399 @@
+"""Нагрузочный тест бота на локальном сервере Bot API
+
+Поднимает в том же процессе упрощенную замену Telegram Bot API (getUpdates,
+sendMessage, editMessageText, sendDocument, answerCallbackQuery), направляет
+на нее бота через base_url и проигрывает сценарии пользователей:
+
+    /start -> конфигурация -> емкости -> расчет -> скачивание CSV
+
+Пример:
+
+    python loadtest.py --users 20 --sessions 5 --series 10 --parallel 4
+
+С --shards N бот запускается в многопроцессном режиме (диспетчер и N
+процессов-шардов) в отдельном процессе и обращается к тому же серверу.
+
+Отчет: пропускная способность, p50/p99 задержки обработчиков и задержка
+цикла событий. Сервер и бот работают в одном цикле событий, поэтому цифры
+включают небольшие накладные расходы самого сервера.
+"""
+import argparse
+import asyncio
+import email.parser
+import email.policy
+import itertools
+import json
+import logging
+import multiprocessing
+import random
+import time
+from typing import Dict, List, Optional, Set, Tuple
+from urllib.parse import parse_qsl, urlsplit
+
+from battery_balancer.bot import build_application
+from battery_balancer.bot.app import LOG_FORMAT
+from battery_balancer.bot.runtime import solver, start_solver_pool
+from battery_balancer.bot.sharding import run_supervisor
+
+logger = logging.getLogger(__name__)
+
+FAKE_TOKEN = "123456:LOADTEST"
+BOT_USER = {'id': 123456, 'is_bot': True, 'first_name': 'LoadTest', 'username': 'loadtest_bot'}
+
+def percentile(values: List[float], percent: float) -> float:
+    """Перцентиль по отсортированной выборке (ближайший ранг)"""
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    rank = max(0, min(len(ordered) - 1, int(round(percent / 100 * len(ordered))) - 1))
+    return ordered[rank]
+
+class FakeBotApi:
+    """Минимальный HTTP-сервер, имитирующий Telegram Bot API"""
+
+    def __init__(self):
+        self.updates: List[Dict] = []
+        self.update_ids = itertools.count(1)
+        self.message_ids = itertools.count(1)
+        self.new_updates = asyncio.Condition()
+        self.outboxes: Dict[int, asyncio.Queue] = {}
+        self.calls: Dict[str, int] = {}
+        self.server: Optional[asyncio.AbstractServer] = None
+        self.connections: Set[asyncio.Task] = set()
+        self.port = 0
+
+    @property
+    def base_url(self) -> str:
+        return f"http://127.0.0.1:{self.port}/bot"
+
+    async def start(self) -> None:
+        self.server = await asyncio.start_server(self._serve_connection, '127.0.0.1', 0)
+        self.port = self.server.sockets[0].getsockname()[1]
+
+    async def stop(self) -> None:
+        if self.server is not None:
+            self.server.close()
+            # Открытые соединения (long polling бота) закрываются тихо
+            for task in self.connections:
+                task.cancel()
+            await asyncio.gather(*self.connections, return_exceptions=True)
+            await self.server.wait_closed()
+
+    def outbox(self, chat_id: int) -> asyncio.Queue:
+        """Очередь ответов бота в чат пользователя"""
+        return self.outboxes.setdefault(chat_id, asyncio.Queue())
+
+    async def push_update(self, update: Dict) -> None:
+        update['update_id'] = next(self.update_ids)
+        async with self.new_updates:
+            self.updates.append(update)
+            self.new_updates.notify_all()
+
+    async def _serve_connection(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter) -> None:
+        task = asyncio.current_task()
+        self.connections.add(task)
+        try:
+            while True:
+                request_line = await reader.readline()
+                if not request_line:
+                    break
+                _, target, _ = request_line.decode('latin-1').split(' ', 2)
+                headers = {}
+                while True:
+                    line = await reader.readline()
+                    if line in (b'\r\n', b'\n', b''):
+                        break
+                    name, _, value = line.decode('latin-1').partition(':')
+                    headers[name.strip().lower()] = value.strip()
+                body = await reader.readexactly(int(headers.get('content-length', 0)))
+
+                method = urlsplit(target).path.rsplit('/', 1)[-1]
+                params = self._parse_params(headers.get('content-type', ''), body)
+                result = await self._dispatch(method, params)
+
+                payload = json.dumps({'ok': True, 'result': result}).encode('utf-8')
+                writer.write(
+                    b"HTTP/1.1 200 OK\r\nContent-Type: application/json\r\n"
+                    b"Content-Length: " + str(len(payload)).encode() + b"\r\n\r\n" + payload
+                )
+                await writer.drain()
+        except (asyncio.IncompleteReadError, ConnectionError):
+            pass
+        except asyncio.CancelledError:
+            # Отмена при остановке сервера - штатное завершение: отмененная задача
+            # обработчика соединения asyncio выводит как необработанную ошибку
+            pass
+        finally:
+            self.connections.discard(task)
+            writer.close()
+
+    @staticmethod
+    def _parse_params(content_type: str, body: bytes) -> Dict:
+        """Параметры запроса: form-urlencoded, multipart или JSON"""
+        if content_type.startswith('multipart/form-data'):
+            message = email.parser.BytesParser(policy=email.policy.HTTP).parsebytes(
+                b"Content-Type: " + content_type.encode('latin-1') + b"\r\n\r\n" + body
+            )
+            params = {}
+            for part in message.iter_parts():
+                name = part.get_param('name', header='content-disposition')
+                if part.get_filename() is None:
+                    params[name] = part.get_content().strip()
+                else:
+                    params[name] = len(part.get_payload(decode=True) or b'')
+            return params
+        if content_type.startswith('application/json'):
+            return json.loads(body or b'{}')
+        return dict(parse_qsl(body.decode('utf-8')))
+
+    def _message(self, chat_id: int, text: str = '') -> Dict:
+        return {
+            'message_id': next(self.message_ids),
+            'date': int(time.time()),
+            'chat': {'id': chat_id, 'type': 'private'},
+            'from': BOT_USER,
+            'text': text
+        }
+
+    async def _dispatch(self, method: str, params: Dict):
+        self.calls[method] = self.calls.get(method, 0) + 1
+
+        if method == 'getMe':
+            return BOT_USER
+        if method == 'getUpdates':
+            return await self._get_updates(params)
+        if method in ('sendMessage', 'editMessageText', 'sendDocument'):
+            chat_id = int(params.get('chat_id', 0))
+            message = self._message(chat_id, params.get('text', ''))
+            if method == 'editMessageText' and params.get('message_id'):
+                message['message_id'] = int(params['message_id'])
+            self.outbox(chat_id).put_nowait((time.perf_counter(), method, params, message))
+            return message
+        # answerCallbackQuery, deleteWebhook и прочие служебные методы
+        return True
+
+    async def _get_updates(self, params: Dict) -> List[Dict]:
+        offset = int(params.get('offset') or 0)
+        timeout = float(params.get('timeout') or 0)
+        # Подтвержденные обновления больше не нужны
+        self.updates = [u for u in self.updates if u['update_id'] >= offset]
+        async with self.new_updates:
+            if not self.updates and timeout > 0:
+                try:
+                    await asyncio.wait_for(self.new_updates.wait(), timeout)
+                except asyncio.TimeoutError:
+                    pass
+        return list(self.updates)
+
+class ScriptedUser:
+    """Пользователь, проигрывающий сценарий расчета"""
+
+    def __init__(self, api: FakeBotApi, user_id: int, timeout: float):
+        self.api = api
+        self.user_id = user_id
+        self.timeout = timeout
+        self.user = {'id': user_id, 'is_bot': False, 'first_name': f"user{user_id}"}
+        self.chat = {'id': user_id, 'type': 'private'}
+        self.last_message_id: Optional[int] = None
+        self.callback_ids = itertools.count(1)
+
+    def _message_update(self, text: str) -> Dict:
+        message = {
+            'message_id': next(self.api.message_ids),
+            'date': int(time.time()),
+            'chat': self.chat,
+            'from': self.user,
+            'text': text
+        }
+        if text.startswith('/'):
+            message['entities'] = [{'type': 'bot_command', 'offset': 0, 'length': len(text.split()[0])}]
+        return {'message': message}
+
+    def _callback_update(self, data: str) -> Dict:
+        return {
+            'callback_query': {
+                'id': f"{self.user_id}-{next(self.callback_ids)}",
+                'from': self.user,
+                'chat_instance': str(self.user_id),
+                'data': data,
+                'message': {
+                    'message_id': self.last_message_id,
+                    'date': int(time.time()),
+                    'chat': self.chat,
+                    'from': BOT_USER,
+                    'text': ''
+                }
+            }
+        }
+
+    async def step(self, update: Dict, method: str, markup: Optional[str] = None) -> float:
+        """Отправить обновление и дождаться ответа бота; возвращает задержку в секундах
+
+        Шаг завершен, когда бот вызвал method, а если задан markup -
+        когда в клавиатуре ответа есть кнопка с этим callback_data.
+        """
+        outbox = self.api.outbox(self.user_id)
+        started = time.perf_counter()
+        await self.api.push_update(update)
+
+        deadline = started + self.timeout
+        while True:
+            remaining = deadline - time.perf_counter()
+            if remaining <= 0:
+                raise TimeoutError(f"нет ответа {method} ({markup or 'любой'})")
+            finished, called, params, message = await asyncio.wait_for(outbox.get(), remaining)
+            if called != method:
+                continue
+            if markup is not None and markup not in str(params.get('reply_markup', '')):
+                continue
+            if method != 'sendDocument':
+                self.last_message_id = message['message_id']
+            return finished - started
+
+    async def run_session(self, capacities: List[int], series: int, parallel: int) -> List[Tuple[str, float]]:
+        """Полный сценарий: возвращает задержки по шагам"""
+        capacities_text = ' '.join(str(cap) for cap in capacities)
+        script = [
+            ('start', self._message_update('/start'), 'sendMessage', 'config'),
+            ('config', lambda: self._callback_update('config'), 'editMessageText', 'set_series'),
+            ('set_series', lambda: self._callback_update('set_series'), 'editMessageText', None),
+            ('series', self._message_update(str(series)), 'sendMessage', 'set_parallel'),
+            ('set_parallel', lambda: self._callback_update('set_parallel'), 'editMessageText', None),
+            ('parallel', self._message_update(str(parallel)), 'sendMessage', 'set_capacities'),
+            ('set_capacities', lambda: self._callback_update('set_capacities'), 'editMessageText', None),
+            ('capacities', self._message_update(capacities_text), 'sendMessage', 'calculate'),
+            ('calculate', lambda: self._callback_update('calculate'), 'editMessageText', 'download_csv'),
+            ('download_csv', lambda: self._callback_update('download_csv'), 'sendDocument', None),
+        ]
+        latencies = []
+        for name, update, method, markup in script:
+            # Callback-обновления строятся непосредственно перед отправкой,
+            # чтобы ссылаться на последнее сообщение бота
+            if callable(update):
+                update = update()
+            latencies.append((name, await self.step(update, method, markup)))
+        return latencies
+
+async def measure_loop_lag(samples: List[float], interval: float = 0.05) -> None:
+    """Задержка цикла событий: насколько позже запланированного просыпается sleep"""
+    loop = asyncio.get_running_loop()
+    while True:
+        expected = loop.time() + interval
+        await asyncio.sleep(interval)
+        samples.append(max(0.0, loop.time() - expected))
+
+async def run_load_test(args) -> Dict:
+    api = FakeBotApi()
+    await api.start()
+
+    if args.shards > 1:
+        context = multiprocessing.get_context('spawn')
+        ready = context.Event()
+        supervisor = context.Process(
+            target=run_supervisor, args=(FAKE_TOKEN, api.base_url, args.shards, ready)
+        )
+        supervisor.start()
+        # Запуск процессов и импорт не должны попасть в задержку первого шага
+        if not await asyncio.get_running_loop().run_in_executor(None, ready.wait, args.timeout):
+            raise RuntimeError(f"Шарды не запустились за {args.timeout:.0f} с")
+    else:
+        executor = start_solver_pool(args.workers)
+        application = build_application(FAKE_TOKEN, api.base_url)
+        await application.initialize()
+        await application.updater.start_polling(poll_interval=0.0, timeout=10)
+        await application.start()
+
+    rng = random.Random(args.seed)
+    cells = args.series * args.parallel
+    pack_count = args.packs or args.users * args.sessions
+    packs = [[rng.randint(args.min_capacity, args.max_capacity) for _ in range(cells)] for _ in range(pack_count)]
+
+    lag_samples: List[float] = []
+    lag_task = asyncio.create_task(measure_loop_lag(lag_samples))
+    step_latencies: Dict[str, List[float]] = {}
+    errors: List[str] = []
+
+    async def virtual_user(index: int) -> None:
+        for session in range(args.sessions):
+            user = ScriptedUser(api, 1_000_000 + index * args.sessions + session, args.timeout)
+            try:
+                latencies = await user.run_session(rng.choice(packs), args.series, args.parallel)
+            except (TimeoutError, asyncio.TimeoutError) as e:
+                errors.append(f"user {user.user_id}: {e}")
+                continue
+            for name, latency in latencies:
+                step_latencies.setdefault(name, []).append(latency)
+
+    started = time.perf_counter()
+    await asyncio.gather(*(virtual_user(i) for i in range(args.users)))
+    elapsed = time.perf_counter() - started
+
+    lag_task.cancel()
+    if args.shards > 1:
+        # SIGTERM - корректная остановка диспетчера и шардов
+        supervisor.terminate()
+        await asyncio.get_running_loop().run_in_executor(None, supervisor.join)
+    else:
+        await application.updater.stop()
+        await application.stop()
+        await application.shutdown()
+        executor.shutdown()
+    await api.stop()
+
+    all_latencies = [latency for values in step_latencies.values() for latency in values]
+    sessions_ok = args.users * args.sessions - len(errors)
+    return {
+        'users': args.users,
+        'sessions': args.users * args.sessions,
+        'sessions_ok': sessions_ok,
+        'errors': errors[:10],
+        'elapsed_sec': round(elapsed, 3),
+        'sessions_per_sec': round(sessions_ok / elapsed, 2),
+        'updates_per_sec': round(len(all_latencies) / elapsed, 2),
+        'handler_latency_ms': {
+            name: {
+                'p50': round(percentile(values, 50) * 1000, 1),
+                'p99': round(percentile(values, 99) * 1000, 1)
+            }
+            for name, values in step_latencies.items()
+        },
+        'overall_latency_ms': {
+            'p50': round(percentile(all_latencies, 50) * 1000, 1),
+            'p99': round(percentile(all_latencies, 99) * 1000, 1)
+        },
+        'loop_lag_ms': {
+            'p50': round(percentile(lag_samples, 50) * 1000, 1),
+            'p99': round(percentile(lag_samples, 99) * 1000, 1),
+            'max': round(max(lag_samples, default=0.0) * 1000, 1)
+        },
+        'shards': args.shards,
+        # В режиме шардов решатели работают в других процессах
+        'solver': dict(solver.metrics) if args.shards <= 1 else None,
+        'api_calls': api.calls
+    }
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Нагрузочный тест бота на локальном сервере Bot API")
+    parser.add_argument('--users', type=int, default=10, help="число одновременных пользователей")
+    parser.add_argument('--sessions', type=int, default=3, help="сценариев на пользователя")
+    parser.add_argument('--series', type=int, default=10)
+    parser.add_argument('--parallel', type=int, default=4)
+    parser.add_argument('--min-capacity', type=int, default=2300)
+    parser.add_argument('--max-capacity', type=int, default=2700)
+    parser.add_argument('--packs', type=int, default=0,
+                        help="число разных наборов емкостей (0 - свой набор на каждый сценарий)")
+    parser.add_argument('--workers', type=int, default=None, help="процессов в пуле расчетов")
+    parser.add_argument('--shards', type=int, default=1,
+                        help="процессов-шардов бота (больше 1 - многопроцессный режим)")
+    parser.add_argument('--timeout', type=float, default=60.0, help="таймаут ответа на шаг, сек")
+    parser.add_argument('--seed', type=int, default=1)
+    parser.add_argument('-v', '--verbose', action='store_true', help="подробные логи бота")
+    args = parser.parse_args()
+
+    logging.basicConfig(format=LOG_FORMAT, level=logging.INFO if args.verbose else logging.WARNING)
+
+    report = asyncio.run(run_load_test(args))
+    print(json.dumps(report, ensure_ascii=False, indent=2))
+
+if __name__ == "__main__":
+    main()
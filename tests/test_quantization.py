@@ -0,0 +1,39 @@
+"""Тесты качества балансировки с квантованием емкостей"""
+import random
+
+import pytest
+
+from battery_balancer.engine import BatteryBalancer
+
+# Допуск к максимальному отклонению точного расчета, мАч
+TOLERANCE = 10
+
+def max_deviation(groups, series):
+    target = sum(group['capacity'] for group in groups) / series
+    return max(abs(group['capacity'] - target) for group in groups)
+
+@pytest.mark.parametrize('series, parallel, bucket_width', [
+    (20, 10, 10),
+    (20, 10, 25),
+    (20, 10, 50),
+    (10, 20, 50),
+    (4, 50, 25),
+])
+def test_quantized_result_close_to_exact(series, parallel, bucket_width):
+    balancer = BatteryBalancer()
+    for seed in range(3):
+        rng = random.Random(seed)
+        capacities = [rng.randint(2000, 3000) for _ in range(series * parallel)]
+
+        exact = balancer.balance_batteries_repackr(capacities, series, parallel)
+        quantized = balancer.balance_batteries_repackr(capacities, series, parallel, bucket_width)
+
+        # Каждый аккумулятор использован ровно один раз и с реальной емкостью
+        cells = [cell for group in quantized for cell in group['cells']]
+        assert sorted(cell['index'] for cell in cells) == list(range(len(capacities)))
+        assert all(capacities[cell['index']] == cell['capacity'] for cell in cells)
+        for group in quantized:
+            assert len(group['cells']) == parallel
+            assert group['capacity'] == sum(cell['capacity'] for cell in group['cells'])
+
+        assert max_deviation(quantized, series) <= max_deviation(exact, series) + TOLERANCE
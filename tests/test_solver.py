@@ -0,0 +1,49 @@
+"""Тесты дедупликации расчетов SingleFlightSolver"""
+import asyncio
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from battery_balancer.bot import solver as solver_module
+from battery_balancer.bot.solver import SingleFlightSolver
+from battery_balancer.engine import solve_job
+
+CAPACITIES = [2500, 2550, 2480, 2600, 2520, 2490, 2570, 2510]
+
+def test_overlapping_identical_requests_share_one_run(monkeypatch):
+    calls = []
+    release = threading.Event()
+
+    def slow_solve_job(*args):
+        calls.append(args)
+        # Расчет не завершается, пока второй запрос не встанет в ожидание
+        release.wait(5)
+        return solve_job(*args)
+
+    monkeypatch.setattr(solver_module, 'solve_job', slow_solve_job)
+
+    async def scenario():
+        with ThreadPoolExecutor(max_workers=2) as executor:
+            solver = SingleFlightSolver(executor, cache_size=0)
+            first = asyncio.ensure_future(solver.solve(CAPACITIES, 4, 2))
+            await asyncio.sleep(0)
+            # Тот же набор в другом порядке
+            second = asyncio.ensure_future(solver.solve(list(reversed(CAPACITIES)), 4, 2))
+            await asyncio.sleep(0)
+
+            assert len(solver._inflight) == 1
+            inflight = next(iter(solver._inflight.values()))
+
+            release.set()
+            groups_first, groups_second = await asyncio.gather(first, second)
+            return solver, inflight, groups_first, groups_second
+
+    solver, inflight, groups_first, groups_second = asyncio.run(scenario())
+
+    assert len(calls) == 1
+    assert inflight.done()
+    assert solver.metrics == {'requests': 2, 'computed': 1, 'deduplicated': 1, 'cache_hits': 0}
+    # Индексы переведены в порядок ячеек каждого запроса
+    for capacities, groups in ((CAPACITIES, groups_first), (list(reversed(CAPACITIES)), groups_second)):
+        for group in groups:
+            for cell in group['cells']:
+                assert capacities[cell['index']] == cell['capacity']